@@ -1,5 +1,6 @@
 from flask import Flask
 from flask_cors import CORS
+import db
 from routes.role_update import role_update_bp
 from routes.role_delete import role_delete_bp
 from routes.staff_update import staff_update_bp
@@ -16,6 +17,10 @@ from routes.report import report_bp
 from routes.agent import agent_bp
 from routes.availability import availability_bp
 from routes.solve import solve_bp
+from routes.solve_jobs import solve_jobs_bp
+from routes.solve_week import solve_week_bp
+from routes.solve_horizon import solve_horizon_bp
+from routes.solve_publish import solve_publish_bp
 # from routes.agent import agent_bp
 
 # from routes.agent_memory import agent_memory_bp
@@ -25,6 +30,9 @@ app = Flask(__name__)
 # Enable CORS for all routes and origins (no credentials)
 CORS(app)  # equivalent to CORS(app, resources={r"/*": {"origins": "*"}})
 
+# Shared Postgres connection pools; per-request checkout time in the Server-Timing header
+db.init_app(app)
+
 @app.route("/")
 def home():
     return "Hello, this is the Home route!"
@@ -45,6 +53,10 @@ app.register_blueprint(agent_bp)
 app.register_blueprint(staff_update_bp)
 app.register_blueprint(staff_delete_bp)
 app.register_blueprint(solve_bp)  # exposes POST /api/availability/save
+app.register_blueprint(solve_jobs_bp)  # exposes /api/solve/jobs (worker: python -m routes.solve worker)
+app.register_blueprint(solve_week_bp)  # exposes POST /api/solve/week
+app.register_blueprint(solve_horizon_bp)  # exposes POST /api/solve/horizon
+app.register_blueprint(solve_publish_bp)  # exposes POST /api/solve/publish
 app.register_blueprint(availability_bp)  # exposes POST /api/availability/save
 
 # app.register_blueprint(agent_bp)
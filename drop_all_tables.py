@@ -1,7 +1,7 @@
 import os
 from typing import List
-import psycopg2
-from psycopg2 import sql
+import psycopg
+from psycopg import sql
 
 # Reuse the existing connection factory from schema.py
 try:
@@ -12,7 +12,7 @@ except Exception:
         DATABASE_URL = os.getenv('DATABASE_URL')
         if not DATABASE_URL:
             raise Exception("Set DATABASE_URL environment variable")
-        return psycopg2.connect(DATABASE_URL)
+        return psycopg.connect(DATABASE_URL)
 
 
 def list_tables(cur) -> List[str]:
@@ -6,8 +6,8 @@ from typing import List, Dict, Any
 from flask import Blueprint, request, jsonify
 from dotenv import load_dotenv
 from groq import Groq
-import psycopg
 from psycopg.rows import dict_row
+from db import connection
 from datetime import datetime, timezone
 import requests
 
@@ -45,7 +45,7 @@ CREATE INDEX IF NOT EXISTS idx_conv_shop_time ON conversations (shop_id, created
 """
 
 def _conn():
-    return psycopg.connect(DBURL)  # psycopg3 connection [web:505]
+    return connection()  # pooled psycopg3 connection (db.py)
 
 def _ensure_tables():
     with _conn() as conn, conn.cursor() as cur:
@@ -4,9 +4,9 @@ from typing import Dict, List
 
 from flask import Blueprint, request, jsonify
 from dotenv import load_dotenv
-import psycopg
 from psycopg.rows import dict_row
 from psycopg.types.json import Json
+from db import connection
 
 load_dotenv()
 DBURL = os.getenv("DBURL")
@@ -22,7 +22,7 @@ WEEKDAYS = ("monday","tuesday","wednesday","thursday","friday","saturday","sunda
 TIME_RE = re.compile(r"^(?:[01]\d|2[0-3]):[0-5]\d$")
 
 def _conn():
-    return psycopg.connect(DBURL)  # psycopg3 connection [web:505]
+    return connection()  # pooled psycopg3 connection (db.py)
 
 def _parse_range(r: str):
     if not isinstance(r, str) or "-" not in r:
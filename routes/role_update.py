@@ -1,20 +1,14 @@
 from __future__ import annotations
 
-import os
 from flask import Blueprint, request, jsonify
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from dotenv import load_dotenv
-
-load_dotenv()
-DBURL = os.getenv("DBURL")
+from psycopg.rows import dict_row
+from db import connection
 
 role_update_bp = Blueprint("role_update_bp", __name__, url_prefix="/api")
 
 def _get_conn():
-    if not DBURL:
-        raise RuntimeError("DBURL not set in .env")
-    return psycopg2.connect(DBURL)
+    # Pooled connection (db.py); commits when the with-block exits cleanly
+    return connection()
 
 @role_update_bp.put("/role/update")
 def role_update():
@@ -59,7 +53,7 @@ def role_update():
     vals.extend([role_id, shop_id])
 
     try:
-        with _get_conn() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+        with _get_conn() as conn, conn.cursor(row_factory=dict_row) as cur:
             cur.execute(sql, vals)
             row = cur.fetchone()
             if not row:
@@ -7,6 +7,7 @@
 #
 # CLI:
 #   python schedule.py --input input.json --output schedule.json
+#   python -m routes.solve worker        # async solve job worker (routes/solve_jobs.py)
 #
 # Flask:
 #   from routes.schedule import schedule_bp
@@ -16,18 +17,35 @@ import json
 import argparse
 import math
 import os
+import sys
+import time
 from datetime import datetime, timedelta, timezone
 from collections import defaultdict
 from typing import Dict, List, Tuple, Optional
 from ortools.sat.python import cp_model
+import numpy as np  # used for solution post-processing
+
+from routes.solve_extract import (
+    BackupFinder,
+    dense_assignment,
+    employee_intervals,
+    expand_segments,
+    role_blocks as role_blocks_from_array,
+    slack_groups,
+    solution_values,
+    var_values,
+)
+from routes.solve_presolve import capacity_bound, presolve_summary, role_shortfalls
 
 # Optional Flask imports (kept lazy-safe for CLI usage)
 try:
-    from flask import Blueprint, request, jsonify
+    from flask import Blueprint, Response, request, jsonify, stream_with_context
 except Exception:
     Blueprint = None
+    Response = None
     request = None
     jsonify = None
+    stream_with_context = None
 
 # Optional DB imports (used when running via Flask route)
 try:
@@ -102,6 +120,22 @@ def availability_slots_for_day(av: List[List[str]], day_open_m: int, day_close_m
             slots[s] = 1
     return slots
 
+def availability_windows_for_label(av, day_label: str):
+    """Pick the availability windows solve_single_day uses for day_label.
+    Accept either list of windows or dict (use day_label's value, else flatten all list values).
+    """
+    if isinstance(av, dict):
+        # Try common keys first, else flatten all values
+        if day_label in av:
+            return av[day_label]
+        # merge all windows across keys
+        av_windows = []
+        for v in av.values():
+            if isinstance(v, list):
+                av_windows.extend(v)
+        return av_windows
+    return av
+
 def build_coverage_for_day(day_cfg: dict, roles: List[str], slot_min: int, slot_size: int = 60):
         """Build per-slot coverage for a day relative to that day's start.
 
@@ -213,7 +247,516 @@ def group_slack_intervals(slack_list: List[int], slot_min: int, slot_size: int =
             cur_max = 0
     return groups
 
-def solve_schedule(data: dict, output_minimal: bool = False, time_limit_s: int = 10):
+def hours_to_slots(hours, slot_size: int = 60) -> int:
+    """Whole slots that fit in "hours" (caps are rounded down)."""
+    return int(float(hours) * 60) // int(slot_size)
+
+def slots_to_hours(n_slots: int, slot_size: int = 60):
+    hours = int(n_slots) * int(slot_size) / 60.0
+    return int(hours) if hours == int(hours) else round(hours, 2)
+
+def compress_slots(cov: List[dict], emp_avail: List[List[int]], max_len: int) -> List[Tuple[int, int]]:
+    """Merge runs of consecutive slots into segments [s0, s1) of at most max_len slots.
+
+    A run continues only while the demand (cov[s]) and every employee's availability stay the
+    same, so an employee working a whole segment is exactly as feasible as working each of its
+    slots. max_len=1 returns one segment per slot (no compression).
+    """
+    S = len(cov)
+    cols = list(zip(*emp_avail)) if emp_avail else [()] * S
+    segments = []
+    start = 0
+    for s in range(1, S + 1):
+        if s == S or s - start >= max_len or cov[s] != cov[start] or cols[s] != cols[start]:
+            segments.append((start, s))
+            start = s
+    return segments
+
+def slot_segments(segments: List[Tuple[int, int]]) -> List[int]:
+    """Segment index of every slot."""
+    out = []
+    for g, (a, b) in enumerate(segments):
+        out.extend([g] * (b - a))
+    return out
+
+def segment_set(slot_set: set, segments: List[Tuple[int, int]], slot_seg: List[int]) -> set:
+    """Map (e, slot, r) triples to (e, segment, r), keeping only segments covered in full."""
+    counts = defaultdict(int)
+    for e, s, r in slot_set:
+        if 0 <= s < len(slot_seg):
+            counts[(e, slot_seg[s], r)] += 1
+    return {(e, g, r) for (e, g, r), n in counts.items() if n == segments[g][1] - segments[g][0]}
+
+def expand_segment_set(seg_set, segments: List[Tuple[int, int]]) -> set:
+    """Inverse of segment_set: (e, segment, r) -> every (e, slot, r) inside the segment."""
+    return {(e, s, r) for e, g, r in seg_set for s in range(*segments[g])}
+
+def build_sparse_assign(model, emp_avail: List[List[int]], emp_can_role: List[List[int]], prefix: str = "",
+                        slot_weights: Optional[List[int]] = None):
+    """Create assignment vars only for (employee, slot, role) triples that are available and qualified.
+
+    Returns (assign, index) where assign maps (e, s, r) -> BoolVar and index holds the
+    per-constraint groupings used by the model builders:
+        by_slot_role[(s, r)] -> vars covering role r in slot s
+        by_emp_slot[(e, s)]  -> vars of employee e in slot s (one-role-per-slot)
+        by_emp[e]            -> all vars of employee e (hours), times slot_weights[s] when the
+                                "slots" are compressed segments (see compress_slots)
+    """
+    assign = {}
+    by_slot_role = defaultdict(list)
+    by_emp_slot = defaultdict(list)
+    by_emp = defaultdict(list)
+    for e, av in enumerate(emp_avail):
+        roles_ok = [r for r, can in enumerate(emp_can_role[e]) if can]
+        if not roles_ok:
+            continue
+        for s, on in enumerate(av):
+            if not on:
+                continue
+            for r in roles_ok:
+                v = model.NewBoolVar(f"a{prefix}_e{e}_s{s}_r{r}")
+                assign[(e, s, r)] = v
+                by_slot_role[(s, r)].append(v)
+                by_emp_slot[(e, s)].append(v)
+                by_emp[e].append(slot_weights[s] * v if slot_weights and slot_weights[s] != 1 else v)
+    index = {"by_slot_role": by_slot_role, "by_emp_slot": by_emp_slot, "by_emp": by_emp}
+    return assign, index
+
+FORMULATIONS = ("slots", "intervals")
+SHIFT_DEFAULTS = {"min_shift_minutes": 120, "max_shift_minutes": 360, "max_shifts_per_day": 2, "min_gap_minutes": 60}
+
+def add_shift_intervals(model, assign_index: dict, seg_avail: List[List[int]], segments: List[Tuple[int, int]],
+                        slot_size: int = 60, min_shift_minutes: int = 120, max_shift_minutes: int = 360,
+                        max_shifts_per_day: int = 2, min_gap_minutes: int = 60, prefix: str = ""):
+    """Tie each employee's segment assignments to at most max_shifts_per_day contiguous shifts.
+
+    Every shift k is an optional interval [start, end) in slots with min/max length. A segment is
+    worked iff exactly one shift contains it; "contains" is only implied one way (segment inside
+    [start, end)), and size == total length of contained segments makes the shift contiguous.
+    Shifts of one employee do not overlap and are at least min_gap_minutes apart.
+
+    Returns {e: [(present, start, end), ...]} for reading shifts back from the solution.
+    """
+    S = segments[-1][1] if segments else 0
+    min_len = max(1, math.ceil(int(min_shift_minutes) / slot_size))
+    max_len = max(min_len, int(max_shift_minutes) // slot_size)
+    gap = math.ceil(int(min_gap_minutes) / slot_size)
+    by_emp_slot = assign_index["by_emp_slot"]
+    shifts = {}
+    for e, av in enumerate(seg_avail):
+        segs = [g for g, on in enumerate(av) if on and by_emp_slot.get((e, g))]
+        if not segs:
+            continue
+        emp_shifts = []
+        intervals = []
+        contained = defaultdict(list)
+        for k in range(max(1, int(max_shifts_per_day))):
+            tag = f"{prefix}_e{e}_k{k}"
+            present = model.NewBoolVar(f"shift{tag}")
+            start = model.NewIntVar(0, S, f"shift_start{tag}")
+            end = model.NewIntVar(0, S, f"shift_end{tag}")
+            size = model.NewIntVar(0, max_len, f"shift_size{tag}")
+            intervals.append(model.NewOptionalIntervalVar(start, size, end, present, f"shift_iv{tag}"))
+            model.Add(size >= min_len).OnlyEnforceIf(present)
+            model.Add(size == 0).OnlyEnforceIf(present.Not())
+            inside = []
+            for g in segs:
+                a, b = segments[g]
+                x = model.NewBoolVar(f"in{tag}_g{g}")
+                model.Add(start <= a).OnlyEnforceIf(x)
+                model.Add(end >= b).OnlyEnforceIf(x)
+                contained[g].append(x)
+                inside.append((b - a) * x)
+            model.Add(size == sum(inside))
+            emp_shifts.append((present, start, end))
+        for g in segs:
+            model.Add(sum(by_emp_slot[(e, g)]) == sum(contained[g]))
+        if len(intervals) > 1:
+            model.AddNoOverlap(intervals)
+        # Shifts are used in order, each starting a gap after the previous one ends
+        for (p0, _s0, e0), (p1, s1, _e1) in zip(emp_shifts, emp_shifts[1:]):
+            model.AddImplication(p1, p0)
+            model.Add(s1 >= e0 + gap).OnlyEnforceIf(p1)
+        shifts[e] = emp_shifts
+    return shifts
+
+def add_break_rule(model, by_emp_slot: dict, segments: List[Tuple[int, int]], slot_seg: List[int], E: int,
+                   slot_size: int = 60) -> int:
+    """At most 6 h worked in any 7 consecutive hours of one day. Returns the constraints added.
+    Windows are in slots; a segment counts with its overlap, so the rule stays exact per slot.
+    """
+    S = len(slot_seg)
+    window = 7 * 60 // slot_size
+    limit = window - 60 // slot_size
+    added = 0
+    for e in range(E):
+        seen = set()
+        for start in range(0, max(0, S - window + 1)):
+            terms = []
+            for g in range(slot_seg[start], slot_seg[start + window - 1] + 1):
+                vs = by_emp_slot.get((e, g))
+                if vs:
+                    a, b = segments[g]
+                    terms.append((g, min(b, start + window) - max(a, start), vs))
+            # Windows that cannot exceed the limit, or repeat an earlier window's terms, are skipped
+            key = tuple((g, w) for g, w, _vs in terms)
+            if sum(w for _g, w, _vs in terms) <= limit or key in seen:
+                continue
+            seen.add(key)
+            model.Add(sum(w * v for _g, w, vs in terms for v in vs) <= limit)
+            added += 1
+    return added
+
+def shifts_from_solution(solver, shifts: dict, slot_min: int, slot_size: int = 60) -> Dict[int, List[Tuple[str, str]]]:
+    """Read the present shifts of add_shift_intervals as {e: [(start, end), ...]} clock times."""
+    out = {}
+    for e, emp_shifts in shifts.items():
+        ivs = []
+        for present, start, end in emp_shifts:
+            if solver.Value(present):
+                ivs.append((hhmm(slot_min + solver.Value(start) * slot_size), hhmm(slot_min + solver.Value(end) * slot_size)))
+        if ivs:
+            out[e] = sorted(ivs)
+    return out
+
+def interchangeable_classes(signatures: List[tuple]) -> List[List[int]]:
+    """Group employee indexes whose model signature (roles, availability, caps, prev hours) is identical.
+    Only classes with two or more members are returned; members keep input order.
+    """
+    groups = defaultdict(list)
+    for e, sig in enumerate(signatures):
+        groups[sig].append(e)
+    return [members for members in groups.values() if len(members) > 1]
+
+def add_symmetry_breaking(model, classes: List[List[int]], hours: list, hinted: Optional[Dict[int, int]] = None) -> dict:
+    """Order interchangeable employees by hours worked (hours[a] >= hours[b] within a class).
+
+    Any solution can be permuted inside a class without changing coverage or fairness, so this
+    only removes duplicates from the search. With a warm-start hint, members are ranked by their
+    hinted hours first so the hinted assignment stays feasible.
+    """
+    added = 0
+    for members in classes:
+        if hinted:
+            members = sorted(members, key=lambda e: -hinted.get(e, 0))
+        for a, b in zip(members, members[1:]):
+            model.Add(hours[a] >= hours[b])
+            added += 1
+    return {"classes": len(classes), "employees": sum(len(m) for m in classes), "constraints": added}
+
+def model_stats(model, assign_vars: int, dense_vars: int, build_s: float) -> dict:
+    proto = model.Proto()
+    return {
+        "build_ms": round(build_s * 1000.0, 2),
+        "assign_vars": int(assign_vars),
+        "dense_assign_vars": int(dense_vars),
+        "total_vars": len(proto.variables),
+        "constraints": len(proto.constraints),
+    }
+
+OBJECTIVE_MODES = ("weighted", "lexicographic")
+SOLVE_MODES = ("exact", "fast", "auto")
+SLOT_SIZES = (15, 30, 60)
+_STATUS_NAMES = {cp_model.OPTIMAL: "OPTIMAL", cp_model.FEASIBLE: "FEASIBLE", cp_model.INFEASIBLE: "INFEASIBLE",
+                 cp_model.MODEL_INVALID: "MODEL_INVALID", cp_model.UNKNOWN: "UNKNOWN"}
+
+def _new_solver(time_limit_s, num_workers: int, max_memory_mb: int, relative_gap_limit: Optional[float] = None):
+    solver = cp_model.CpSolver()
+    time_limit_s = int(time_limit_s or 0)
+    if time_limit_s:
+        solver.parameters.max_time_in_seconds = float(time_limit_s)
+    if relative_gap_limit:
+        solver.parameters.relative_gap_limit = float(relative_gap_limit)
+    solver.parameters.num_search_workers = max(1, int(num_workers))
+    if max_memory_mb:
+        solver.parameters.max_memory_in_mb = int(max_memory_mb)
+    return solver
+
+def _phase_info(name: str, solver, status, t0: float) -> dict:
+    ok = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+    return {
+        "phase": name,
+        "status": _STATUS_NAMES.get(status, str(status)),
+        "time_s": round(time.perf_counter() - t0, 3),
+        "objective": round(solver.ObjectiveValue(), 3) if ok else None,
+        "bound": round(solver.BestObjectiveBound(), 3) if ok else None,
+    }
+
+def relative_gap(objective_value: float, bound: float) -> float:
+    """CP-SAT's relative gap: |objective - bound| / max(1, |objective|)."""
+    return abs(objective_value - bound) / max(1.0, abs(objective_value))
+
+class _SolutionCallback(cp_model.CpSolverSolutionCallback):
+    """Per improving solution: report it to on_solution(values, info) and/or stop the search once
+    slack reaches stop_at_slack (the pre-solve lower bound).
+    """
+
+    def __init__(self, slack, phase: str, stop_at_slack: Optional[int] = None, on_solution=None):
+        super().__init__()
+        self._slack = slack
+        self._phase = phase
+        self._stop_at = stop_at_slack
+        self._on_solution = on_solution
+
+    def on_solution_callback(self):
+        if self._on_solution is not None:
+            obj, bound = self.ObjectiveValue(), self.BestObjectiveBound()
+            self._on_solution(np.asarray(self.response_proto.solution, dtype=np.int64), {
+                "phase": self._phase,
+                "time_s": round(self.WallTime(), 3),
+                "objective": round(obj, 3),
+                "bound": round(bound, 3),
+                "gap": round(relative_gap(obj, bound), 6),
+            })
+        if self._stop_at is not None and self.Value(self._slack) <= self._stop_at:
+            self.StopSearch()
+
+def _solve(solver, model, slack, phase: str, stop_at_slack: Optional[int] = None, on_solution=None):
+    if stop_at_slack is None and on_solution is None:
+        return solver.Solve(model)
+    return solver.Solve(model, _SolutionCallback(slack, phase, stop_at_slack, on_solution))
+
+def _gap_status(solver, status, gap_limit: Optional[float]):
+    # CP-SAT reports OPTIMAL when it stops at relative_gap_limit; only a closed gap is optimal here
+    if status == cp_model.OPTIMAL and gap_limit and relative_gap(solver.ObjectiveValue(), solver.BestObjectiveBound()) > 1e-9:
+        return cp_model.FEASIBLE
+    return status
+
+def solve_with_objective(model, slack, fairness, slack_weight: int, objective: str = "weighted",
+                         time_limit_s: int = 10, fairness_time_limit_s: Optional[int] = None,
+                         num_workers: int = 8, max_memory_mb: int = 0, slack_lower_bound: int = 0,
+                         stop_at_bound: bool = False, relative_gap_limit: Optional[float] = None,
+                         on_solution=None):
+    """Solve "model" for unmet demand first and fairness second. Returns (solver, status, phases).
+
+    weighted:      one solve of slack_weight * slack + fairness (phases is None).
+    lexicographic: phase 1 minimizes slack alone within time_limit_s; phase 2 fixes slack at the
+        value found, starts from the phase 1 solution and minimizes fairness within
+        fairness_time_limit_s (defaults to time_limit_s). Without the big-M weight both phases
+        keep tight bounds, so CP-SAT can actually prove each one optimal.
+    The returned solver holds the final solution; if phase 2 finds nothing, phase 1's is kept.
+    slack_lower_bound: pre-solve bound on slack (see routes/solve_presolve.py), added as a redundant
+        constraint so the slack objective is proven optimal as soon as a solution reaches it.
+    stop_at_bound: weighted only; return the first solution that reaches slack_lower_bound instead
+        of spending the rest of the time limit on fairness.
+    relative_gap_limit: stop each solve once |objective - bound| / max(1, |objective|) is at most
+        this (e.g. 0.01); the result is then FEASIBLE rather than OPTIMAL.
+    on_solution: called as on_solution(values, info) for every improving solution, with values the
+        full solution vector (see solution_values) and info {phase, time_s, objective, bound, gap}.
+    """
+    if slack_lower_bound:
+        model.Add(slack >= int(slack_lower_bound))
+    if objective != "lexicographic":
+        model.Minimize(slack_weight * slack + fairness)
+        solver = _new_solver(time_limit_s, num_workers, max_memory_mb, relative_gap_limit)
+        status = _solve(solver, model, slack, "weighted", slack_lower_bound if stop_at_bound else None, on_solution)
+        return solver, _gap_status(solver, status, relative_gap_limit), None
+
+    t0 = time.perf_counter()
+    model.Minimize(slack)
+    first = _new_solver(time_limit_s, num_workers, max_memory_mb, relative_gap_limit)
+    status = _gap_status(first, _solve(first, model, slack, "slack", on_solution=on_solution), relative_gap_limit)
+    phases = [_phase_info("slack", first, status, t0)]
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return first, status, phases
+
+    t0 = time.perf_counter()
+    model.Add(slack <= int(round(first.ObjectiveValue())))
+    model.ClearHints()
+    proto = model.Proto()
+    values = first.ResponseProto().solution
+    proto.solution_hint.vars.extend(range(len(values)))
+    proto.solution_hint.values.extend(values)
+    model.Minimize(fairness)
+    if fairness_time_limit_s is None:
+        fairness_time_limit_s = time_limit_s
+    second = _new_solver(fairness_time_limit_s, num_workers, max_memory_mb, relative_gap_limit)
+    status2 = _gap_status(second, _solve(second, model, slack, "fairness", on_solution=on_solution), relative_gap_limit)
+    phases.append(_phase_info("fairness", second, status2, t0))
+    if status2 not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return first, cp_model.FEASIBLE, phases
+    both_optimal = status == cp_model.OPTIMAL and status2 == cp_model.OPTIMAL
+    return second, cp_model.OPTIMAL if both_optimal else cp_model.FEASIBLE, phases
+
+def prior_from_result(result: dict, day_label: str) -> List[dict]:
+    """Flatten a previous solve result's role blocks for one day into prior-assignment entries
+    [{"employee": name, "role": role, "start": "HH:MM", "end": "HH:MM"}, ...].
+    """
+    by_role = ((result or {}).get("schedule") or {}).get("by_role_assignments") or {}
+    out = []
+    for role, blocks in (by_role.get(day_label) or {}).items():
+        for b in blocks:
+            for name in b.get("employees", []):
+                out.append({"employee": name, "role": role, "start": b["start"], "end": b["end"]})
+    return out
+
+def prior_slot_set(prior: List[dict], names: List[str], ids: List[Optional[int]], roles: List[str],
+                   day_open_m: int, S: int, slot_size: int = 60, stats: Optional[dict] = None) -> set:
+    """Map prior-assignment entries to a set of (e, s, r) for this model.
+    Employees are matched by "staff_id"/"id" first, then by name; roles match case-insensitively
+    (shifts rows carry roles.role_name as stored). Unknown staff or roles are skipped; stats, if
+    given, accumulates "prior_entries" and "prior_matched" so an empty hint is visible.
+    """
+    by_id = {i: e for e, i in enumerate(ids) if i is not None}
+    by_name = {n: e for e, n in enumerate(names)}
+    role_index = {r.strip().lower(): i for i, r in enumerate(roles)}
+    out = set()
+    for p in prior or []:
+        e = by_id.get(p.get("staff_id", p.get("id")))
+        if e is None:
+            e = by_name.get(p.get("employee", p.get("name")))
+        r = role_index.get(str(p.get("role") or "").strip().lower())
+        if stats is not None:
+            stats["prior_entries"] = stats.get("prior_entries", 0) + 1
+        if e is None or r is None:
+            continue
+        if stats is not None:
+            stats["prior_matched"] = stats.get("prior_matched", 0) + 1
+        a = parse_time_token(p["start"]); b = parse_time_token(p["end"])
+        s0 = max(0, (a - day_open_m) // slot_size)
+        s1 = min(S, math.ceil((b - day_open_m) / slot_size))
+        for s in range(int(s0), int(s1)):
+            out.add((e, s, r))
+    return out
+
+def add_assignment_hints(model, assign: dict, prior_set: set) -> int:
+    """Hint every sparse assignment var from the prior assignment (1 if it was worked, else 0)."""
+    for k, v in assign.items():
+        model.AddHint(v, 1 if k in prior_set else 0)
+    return len(assign)
+
+def repair_neighborhood(repair: dict, prior_set: set, names: List[str], ids: List[Optional[int]],
+                        day_open_m: int, S: int, slot_size: int = 60) -> Tuple[set, set]:
+    """Employees and slots left free in repair mode.
+
+    Free employees are the changed ones (matched by id or name). Free slots are the given
+    windows plus every slot a changed employee worked in the prior assignment, so whoever
+    covers for them can be re-planned. Everything else is frozen to the prior assignment.
+    """
+    by_id = {i: e for e, i in enumerate(ids) if i is not None}
+    by_name = {n: e for e, n in enumerate(names)}
+    free_emps = set()
+    for ref in repair.get("employees") or []:
+        e = by_id.get(ref) if isinstance(ref, int) else by_name.get(ref)
+        if e is not None:
+            free_emps.add(e)
+    free_slots = {s for (e, s, _r) in prior_set if e in free_emps}
+    for win in repair.get("windows") or []:
+        if isinstance(win, str):
+            a, b = parse_time_range(win)
+        else:
+            a = parse_time_token(win["start"]); b = parse_time_token(win["end"])
+        s0 = max(0, (a - day_open_m) // slot_size)
+        s1 = min(S, math.ceil((b - day_open_m) / slot_size))
+        free_slots.update(range(int(s0), int(s1)))
+    return free_emps, free_slots
+
+def _merge_minute_intervals(ivs: List[Tuple[int, int]]) -> List[List[int]]:
+    merged: List[List[int]] = []
+    for a, b in sorted(ivs):
+        if merged and a <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], b)
+        else:
+            merged.append([a, b])
+    return merged
+
+def diff_assignment(new_entries: List[dict], current_rows: List[dict]) -> dict:
+    """Minimal row diff between a solved assignment and the current shifts rows of a day.
+
+    Both sides are {staff_id, role, start, end} entries (current rows also carry shift_id).
+    A current row is kept when the new assignment still covers it entirely for the same
+    staff and role (roles compare case-insensitively); other rows are removed, and new time
+    not covered by kept rows is added as maximal intervals, spelled as in new_entries.
+    """
+    new_by_key: Dict[tuple, List[Tuple[int, int]]] = defaultdict(list)
+    names: Dict[int, str] = {}
+    role_names: Dict[tuple, str] = {}
+    for n in new_entries:
+        key = (n["staff_id"], n["role"].strip().lower())
+        new_by_key[key].append((parse_time_token(n["start"]), parse_time_token(n["end"])))
+        names[n["staff_id"]] = n.get("employee")
+        role_names[key] = n["role"]
+    merged_new = {k: _merge_minute_intervals(v) for k, v in new_by_key.items()}
+
+    keep, remove = [], []
+    kept_by_key: Dict[tuple, List[Tuple[int, int]]] = defaultdict(list)
+    for row in current_rows:
+        key = (row["staff_id"], (row["role"] or "").strip().lower())
+        a, b = parse_time_token(row["start"]), parse_time_token(row["end"])
+        if any(x <= a and b <= y for x, y in merged_new.get(key, [])):
+            keep.append(row)
+            kept_by_key[key].append((a, b))
+        else:
+            remove.append(row)
+
+    add = []
+    for key, ivs in merged_new.items():
+        kept = sorted(kept_by_key.get(key, []))
+        for x, y in ivs:
+            cur = x
+            for a, b in kept:
+                if b <= cur or a >= y:
+                    continue
+                if a > cur:
+                    add.append((key, cur, a))
+                cur = max(cur, b)
+            if cur < y:
+                add.append((key, cur, y))
+
+    return {
+        "add": [{"staff_id": k[0], "employee": names.get(k[0]), "role": role_names[k], "start": hhmm(a), "end": hhmm(b)}
+                for k, a, b in sorted(add, key=lambda x: (str(x[0][0]), x[1]))],
+        "remove": [{k: r.get(k) for k in ("shift_id", "staff_id", "employee", "role", "start", "end")} for r in remove],
+        "unchanged": len(keep),
+    }
+
+def assignment_entries(result: dict, day_label: str, employees: List[dict]) -> List[dict]:
+    """prior_from_result entries with staff ids attached for DB diffs.
+    A block's employees are names, or carry the staff id ({"id"/"staff_id", "name"} or a bare int),
+    which then wins over the name. Raises ValueError listing the employees that match no staff
+    member, or whose name is shared by several.
+    """
+    name_by_id = {emp.get("id"): emp.get("name") for emp in employees if emp.get("id") is not None}
+    ids_by_name: Dict[str, List[int]] = defaultdict(list)
+    for sid, name in name_by_id.items():
+        ids_by_name[name].append(sid)
+    out, unknown = [], set()
+    for ent in prior_from_result(result, day_label):
+        who, sid = ent["employee"], None
+        if isinstance(who, dict):
+            sid, who = who.get("staff_id", who.get("id")), who.get("name")
+        elif isinstance(who, int) and not isinstance(who, bool):
+            sid, who = who, None
+        if sid is None and len(ids_by_name.get(who, ())) == 1:
+            sid = ids_by_name[who][0]
+        if sid not in name_by_id:
+            unknown.add(str(who if sid is None else sid))
+            continue
+        out.append(dict(ent, employee=name_by_id[sid], staff_id=sid))
+    if unknown:
+        raise ValueError(f"employees not matching exactly one staff member: {sorted(unknown)}")
+    return out
+
+def solve_schedule(data: dict, output_minimal: bool = False, time_limit_s: int = 10,
+                   num_workers: int = 8, max_memory_mb: int = 0, hint: Optional[Dict[str, List[dict]]] = None,
+                   objective: str = "weighted", fairness_time_limit_s: Optional[int] = None,
+                   break_symmetry: bool = True, slot_size: int = 60, max_segment_minutes: int = 60,
+                   formulation: str = "slots", shift_rules: Optional[dict] = None, backups: bool = True,
+                   presolve_only: bool = False, stop_at_bound: bool = False,
+                   relative_gap_limit: Optional[float] = None):
+    """Solve the whole week in one model.
+    presolve_only / stop_at_bound: see solve_single_day; the week bound uses weekly caps and ignores
+        the break rule, so it can sit below the achievable unmet demand.
+    relative_gap_limit: see solve_with_objective.
+    backups: attach up to 5 ranked backup staff to every role block (see BackupFinder).
+    formulation / shift_rules: see solve_single_day. With interval shifts of at most 6 h and a 1 h gap
+        the 7-hour break rule holds by construction, so its sliding-window constraints are skipped.
+    slot_size / max_segment_minutes: slot granularity and segment cap, see solve_single_day.
+    break_symmetry: order interchangeable employees by hours (see add_symmetry_breaking).
+    hint: optional prior assignment per day ({day: [entries]}, see prior_from_result) used as CP-SAT hints.
+    objective: "weighted" (single big-M solve) or "lexicographic" (slack, then fairness with its own
+        fairness_time_limit_s budget; see solve_with_objective).
+    """
     # Roles across week
     roles = set()
     for _, cfg in data["week"].items():
@@ -232,7 +775,6 @@ def solve_schedule(data: dict, output_minimal: bool = False, time_limit_s: int =
         return {"status": "NO_DAYS"}
 
     # Global earliest open and latest close
-    slot_size = 60
     earliest = min(parse_time_token(data["week"][d]["open"]) for d in present_days)
     latest = max(parse_time_token(data["week"][d]["close"]) for d in present_days)
 
@@ -271,69 +813,86 @@ def solve_schedule(data: dict, output_minimal: bool = False, time_limit_s: int =
             for r_i, r in enumerate(roles):
                 emp_can_role[e_i][r_i] = 1 if r in allowed else 0
 
+    # Compress each day's runs of identical slots into segments (see compress_slots);
+    # the model decides per segment and hour quantities are in slots
+    max_len = max(1, int(max_segment_minutes) // slot_size)
+    segments = {d: compress_slots(day_cov[d], emp_avail[d], max_len) for d in present_days}
+    slot_seg = {d: slot_segments(segments[d]) for d in present_days}
+    seg_len = {d: [b - a for a, b in segments[d]] for d in present_days}
+    seg_avail = {d: [[av[a] for a, _b in segments[d]] for av in emp_avail[d]] for d in present_days}
+    max_week = [int(emp.get("max_weekly_hours", 40)) for emp in employees]
+
+    # Pre-solve: max-flow bound on coverable demand and slots short of qualified staff, per day
+    presolve_t0 = time.perf_counter()
+    bound = capacity_bound([(day_cov[d], emp_avail[d], segments[d]) for d in present_days], roles, emp_can_role,
+                           [hours_to_slots(m, slot_size) for m in max_week])
+    shortfalls = {}
+    for d in present_days:
+        day_short = role_shortfalls(day_cov[d], roles, emp_avail[d], emp_can_role,
+                                    earliest + day_slot_bounds[d][0] * slot_size, slot_size)
+        if day_short:
+            shortfalls[d] = day_short
+    presolve = presolve_summary(bound, shortfalls, slot_size, presolve_t0)
+    if presolve_only:
+        return {"status": "PRESOLVE", "presolve": presolve}
+
     # Model
+    build_t0 = time.perf_counter()
     model = cp_model.CpModel()
 
-    # Decision vars: assign[e][d][s][r] in {0,1}
-    assign = {d: [[[model.NewBoolVar(f"a_e{e}_d{d}_s{s}_r{r}")
-                    for r in range(len(roles))]
-                   for s in range(day_slot_bounds[d][1] - day_slot_bounds[d][0])]
-                  for e in range(E)]
-             for d in present_days}
+    # Decision vars: assign[d][(e, g, r)] in {0,1} per segment g, only where available and qualified
+    assign = {}
+    assign_index = {}
+    for d in present_days:
+        assign[d], assign_index[d] = build_sparse_assign(model, seg_avail[d], emp_can_role, prefix=f"_d{d}",
+                                                         slot_weights=seg_len[d])
 
-    # Slack (unmet demand) per day/slot/role to enable diagnostics when coverage cannot be met
-    slack = {d: [[model.NewIntVar(0, 1000, f"slack_d{d}_s{s}_r{r}")
+    # Slack (unmet demand) per day/segment/role to enable diagnostics when coverage cannot be met
+    slack = {d: [[model.NewIntVar(0, 1000, f"slack_d{d}_g{g}_r{r}")
                   for r in range(len(roles))]
-                 for s in range(day_slot_bounds[d][1] - day_slot_bounds[d][0])]
+                 for g in range(len(segments[d]))]
              for d in present_days}
 
     # Coverage with slack: sum(assign) + slack == demand
     for d in present_days:
         cov = day_cov[d]
-        for s, need in enumerate(cov):
-            for r_name, req in need.items():
+        by_slot_role = assign_index[d]["by_slot_role"]
+        for g, (a, _b) in enumerate(segments[d]):
+            for r_name, req in cov[a].items():
                 r = role_index[r_name]
-                model.Add(sum(assign[d][e][s][r] for e in range(E)) + slack[d][s][r] == int(req))
+                model.Add(sum(by_slot_role.get((g, r), [])) + slack[d][g][r] == int(req))
 
-    # Availability, one-role-per-slot, qualification
+    # One role per slot (availability and qualification are implied by the sparse vars)
     for d in present_days:
-        S = day_slot_bounds[d][1] - day_slot_bounds[d][0]
-        for e in range(E):
-            for s in range(S):
-                if emp_avail[d][e][s] == 0:
-                    for r in range(len(roles)):
-                        model.Add(assign[d][e][s][r] == 0)
-                model.Add(sum(assign[d][e][s][r] for r in range(len(roles))) <= 1)
-                for r in range(len(roles)):
-                    if emp_can_role[e][r] == 0:
-                        model.Add(assign[d][e][s][r] == 0)
-
-    # Weekly max hours per employee (slot_size=60 ⇒ 1 slot = 1 hour)
-    max_week = [int(emp.get("max_weekly_hours", 40)) for emp in employees]
+        for vs in assign_index[d]["by_emp_slot"].values():
+            if len(vs) > 1:
+                model.AddAtMostOne(vs)
+
+    # Interval formulation: each day's work is one or two contiguous shifts
+    rules = dict(SHIFT_DEFAULTS, **(shift_rules or {}))
+    shifts = {}
+    if formulation == "intervals":
+        for d in present_days:
+            shifts[d] = add_shift_intervals(model, assign_index[d], seg_avail[d], segments[d], slot_size,
+                                            prefix=f"_d{d}", **rules)
+
+    # Weekly max hours per employee (in slots)
     emp_hours = []
-    BIG_M = int((latest - earliest) / 60 * max(1, len(present_days)) + max(max_week, default=40))
+    BIG_M = int((latest - earliest) // slot_size * max(1, len(present_days)) + hours_to_slots(max(max_week, default=40), slot_size))
     for e in range(E):
         var = model.NewIntVar(0, BIG_M, f"hours_e{e}")
         emp_hours.append(var)
         total_slots = []
         for d in present_days:
-            S = day_slot_bounds[d][1] - day_slot_bounds[d][0]
-            for s in range(S):
-                for r in range(len(roles)):
-                    total_slots.append(assign[d][e][s][r])
+            total_slots.extend(assign_index[d]["by_emp"].get(e, []))
         model.Add(var == sum(total_slots))
-        model.Add(var <= int(max_week[e]))
+        model.Add(var <= hours_to_slots(max_week[e], slot_size))
 
     # Break rule: In any 7 consecutive hours within a day, at least one hour off
-    window = 7
-    for d in present_days:
-        S = day_slot_bounds[d][1] - day_slot_bounds[d][0]
-        for e in range(E):
-            for start in range(0, max(0, S - window + 1)):
-                on_slots = []
-                for s in range(start, start + window):
-                    on_slots.append(sum(assign[d][e][s][r] for r in range(len(roles))))
-                model.Add(sum(on_slots) <= 6)
+    implied_by_shifts = (formulation == "intervals" and rules["max_shift_minutes"] <= 360
+                         and rules["min_gap_minutes"] >= 60)
+    for d in ([] if implied_by_shifts else present_days):
+        add_break_rule(model, assign_index[d]["by_emp_slot"], segments[d], slot_seg[d], E, slot_size)
 
     # Fairness helpers
     min_hours = model.NewIntVar(0, BIG_M, "min_hours")
@@ -351,23 +910,60 @@ def solve_schedule(data: dict, output_minimal: bool = False, time_limit_s: int =
     W_MIN = 1000
     W_USED = 10
     W_RANGE = 1
-    total_slack = sum(slack[d][s][r]
+    total_slack = sum(seg_len[d][g] * slack[d][g][r]
                       for d in present_days
-                      for s in range(day_slot_bounds[d][1] - day_slot_bounds[d][0])
+                      for g in range(len(segments[d]))
                       for r in range(len(roles)))
-    model.Minimize(SLACK_W * total_slack - (W_MIN * min_hours + W_USED * sum(worked)) + W_RANGE * max_hours)
+    fairness = -(W_MIN * min_hours + W_USED * sum(worked)) + W_RANGE * max_hours
+    # Warm start: hint the previous assignment so re-solves start from it
+    warm = None
+    hinted_hours = defaultdict(int)
+    if hint:
+        warm = {"hinted_vars": 0, "prior_slots": 0, "prior_entries": 0, "prior_matched": 0}
+        emp_names_h = [emp.get("name", f"emp{e}") for e, emp in enumerate(employees)]
+        emp_ids_h = [emp.get("id") for emp in employees]
+        for d in present_days:
+            day_prior = hint.get(d)
+            if not day_prior:
+                continue
+            prior_set = prior_slot_set(day_prior, emp_names_h, emp_ids_h, roles,
+                                       parse_time_token(data["week"][d]["open"]),
+                                       day_slot_bounds[d][1] - day_slot_bounds[d][0], slot_size, stats=warm)
+            warm["prior_slots"] += len(prior_set)
+            warm["hinted_vars"] += add_assignment_hints(model, assign[d], segment_set(prior_set, segments[d], slot_seg[d]))
+            for e, _s, _r in prior_set:
+                hinted_hours[e] += 1
+
+    # Symmetry: employees with the same roles, weekly availability and cap are interchangeable
+    symmetry = None
+    if break_symmetry:
+        classes = interchangeable_classes([
+            (tuple(emp_can_role[e]), tuple(tuple(seg_avail[d][e]) for d in present_days), max_week[e])
+            for e in range(E)
+        ])
+        symmetry = add_symmetry_breaking(model, classes, emp_hours, hinted_hours)
+
+    stats = model_stats(
+        model,
+        sum(len(a) for a in assign.values()),
+        E * len(roles) * sum(day_slot_bounds[d][1] - day_slot_bounds[d][0] for d in present_days),
+        time.perf_counter() - build_t0,
+    )
+    stats["slots"] = sum(day_slot_bounds[d][1] - day_slot_bounds[d][0] for d in present_days)
+    stats["segments"] = sum(len(segments[d]) for d in present_days)
+    stats["formulation"] = formulation
+    if symmetry is not None:
+        stats["symmetry"] = symmetry
 
     # Solve
-    solver = cp_model.CpSolver()
-    time_limit_s = int(time_limit_s or 0)
-    if time_limit_s:
-        solver.parameters.max_time_in_seconds = float(time_limit_s)
-    solver.parameters.num_search_workers = 8
-    status = solver.Solve(model)
+    solver, status, phases = solve_with_objective(
+        model, total_slack, fairness, SLACK_W, objective, time_limit_s, fairness_time_limit_s,
+        num_workers, max_memory_mb, bound["lower_bound_unmet"], stop_at_bound, relative_gap_limit)
     if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
-        return {"status": "INFEASIBLE"}
+        return {"status": "INFEASIBLE", "presolve": presolve}
 
-    # Build per-day per-role assignments and minimal day blocks
+    # Build per-day per-role assignments and minimal day blocks from one bulk read of the
+    # solution (see routes/solve_extract.py)
     out = {"status": "FEASIBLE" if status == cp_model.FEASIBLE else "OPTIMAL"}
     schedule = {}
     assignment_debug = {}
@@ -375,99 +971,59 @@ def solve_schedule(data: dict, output_minimal: bool = False, time_limit_s: int =
     # Precompute employee names list for convenience
     emp_names = [employees[e]["name"] for e in range(E)]
     emp_ids = [employees[e].get("id") for e in range(E)]
+    values = solution_values(solver)
+    can_role = np.array(emp_can_role, dtype=bool).reshape(E, len(roles))
+    # Remaining weekly capacity for ranking backups: more remaining capacity, then more hours used, then name
+    hours_used_week = [slots_to_hours(h, slot_size) for h in var_values(values, emp_hours).tolist()]
+    remaining_week = [max_week[e] - hours_used_week[e] for e in range(E)]
+    attendance = {name: {} for name in emp_names}
+    unmet_slots = 0
     for d in present_days:
         day_open_m = parse_time_token(data["week"][d]["open"])
         S = day_slot_bounds[d][1] - day_slot_bounds[d][0]
-        per_role_slots = []
-        per_role_slack = []
-        for r in range(len(roles)):
-            names_per_slot = []
-            slack_per_slot = []
-            for s in range(S):
-                names = []
-                for e in range(E):
-                    if solver.Value(assign[d][e][s][r]) == 1:
-                        names.append(employees[e]["name"])
-                names_per_slot.append(names)
-                slack_per_slot.append(int(solver.Value(slack[d][s][r])))
-            per_role_slots.append(names_per_slot)
-            per_role_slack.append(slack_per_slot)
-
-        role_blocks = merge_shift_blocks_by_role(per_role_slots, day_open_m, slot_size)
+        X = dense_assignment(values, assign[d], segments[d], E, len(roles))
+        on = X.any(axis=2)
+        slack_val = expand_segments(
+            var_values(values, [v for row in slack[d] for v in row]).reshape(len(segments[d]), len(roles)),
+            segments[d])
+        unmet_slots += int(slack_val.sum())
+
+        role_blocks = role_blocks_from_array(X, emp_names, day_open_m, slot_size)
         day_blocks = to_day_blocks_from_role_blocks(role_blocks)
         schedule[d] = day_blocks
 
-        # Compute per-slot assignment occupancy for backup checks
-        assigned_any = [[0]*S for _ in range(E)]
-        for e in range(E):
-            for s in range(S):
-                if any(solver.Value(assign[d][e][s][r]) == 1 for r in range(len(roles))):
-                    assigned_any[e][s] = 1
-
-        # Compute backup staff for each role block
+        # Compute backup staff for each role block (only when requested)
         role_blocks_with_backups = {}
-        # Remaining weekly capacity for ranking (optional)
-        hours_used_week = [int(solver.Value(emp_hours[e])) for e in range(E)]
-        remaining_week = [int(max_week[e] - hours_used_week[e]) for e in range(E)]
+        if backups:
+            finder = BackupFinder(can_role, np.array(emp_avail[d], dtype=bool).reshape(E, S), on,
+                                  emp_names, emp_ids, remaining_week, [-h for h in hours_used_week])
         for r_idx, blocks in role_blocks.items():
-            r_name = roles[r_idx]
+            if not backups:
+                role_blocks_with_backups[roles[r_idx]] = blocks
+                continue
             new_blocks = []
             for b in blocks:
                 # Convert time window to slot indices
-                b_start = parse_time_token(b["start"]) 
-                b_end = parse_time_token(b["end"]) 
-                s0 = max(0, (b_start - day_open_m) // slot_size)
-                s1 = max(s0, (b_end - day_open_m + (slot_size-1)) // slot_size)
-                duration_slots = int(s1 - s0)
-                candidates = []
-                assigned_set = set(b.get("employees", []))
-                for e in range(E):
-                    nm = emp_names[e]
-                    eid = emp_ids[e]
-                    if nm in assigned_set:
-                        continue
-                    if emp_can_role[e][r_idx] == 0:
-                        continue
-                    # Available and not already assigned over the whole block
-                    if s1 > S:
-                        continue
-                    if all(emp_avail[d][e][s] == 1 for s in range(int(s0), int(s1))) and \
-                       all(assigned_any[e][s] == 0 for s in range(int(s0), int(s1))):
-                        candidates.append((remaining_week[e], -hours_used_week[e], nm, eid))
-                # Sort: more remaining capacity, then fewer hours used, then name
-                candidates.sort(key=lambda x: (-x[0], x[1], x[2]))
-                backups = [{"id": eid, "name": nm} for _,__, nm, eid in candidates[:5]]
-                nb = dict(b)
-                nb["backups"] = backups
-                new_blocks.append(nb)
-            role_blocks_with_backups[r_name] = new_blocks
+                s0 = max(0, (parse_time_token(b["start"]) - day_open_m) // slot_size)
+                s1 = max(s0, (parse_time_token(b["end"]) - day_open_m + (slot_size-1)) // slot_size)
+                new_blocks.append(dict(b, backups=finder.backups(r_idx, s0, s1, exclude=b["employees"])))
+            role_blocks_with_backups[roles[r_idx]] = new_blocks
 
         assignment_debug[d] = role_blocks_with_backups
 
         # Unmet demand intervals per role
-        unmet_day = {}
-        for r_name, r_idx in role_index.items():
-            groups = group_slack_intervals(per_role_slack[r_idx], day_open_m, slot_size)
-            if groups:
-                unmet_day[r_name] = groups
+        unmet_day = {roles[r]: groups for r, groups in slack_groups(slack_val, day_open_m, slot_size).items()}
         if unmet_day:
             unmet_by_day[d] = unmet_day
 
-    # Attendance per employee: day intervals where assigned to any role
-    attendance = {}
-    for e in range(E):
-        name = employees[e]["name"]
-        attendance[name] = {}
-        for d in present_days:
-            day_open_m = parse_time_token(data["week"][d]["open"])
-            S = day_slot_bounds[d][1] - day_slot_bounds[d][0]
-            on = [0]*S
-            for s in range(S):
-                assigned_any = any(solver.Value(assign[d][e][s][r]) == 1 for r in range(len(roles)))
-                on[s] = 1 if assigned_any else 0
-            intervals = contiguous_intervals_from_slots(on, day_open_m, slot_size)
-            if intervals:
-                attendance[name][d] = [{"start": a, "end": b} for a, b in intervals]
+        # Attendance per employee: day intervals where assigned to any role (the shifts themselves
+        # in the interval formulation)
+        if d in shifts:
+            day_intervals = shifts_from_solution(solver, shifts[d], day_open_m, slot_size)
+        else:
+            day_intervals = employee_intervals(on, day_open_m, slot_size)
+        for e, intervals in day_intervals.items():
+            attendance[emp_names[e]][d] = [{"start": a, "end": b} for a, b in intervals]
 
     # Diagnostics: quick capacity checks and reasons
     diagnostics = {"days": {}}
@@ -502,17 +1058,52 @@ def solve_schedule(data: dict, output_minimal: bool = False, time_limit_s: int =
     out["attendance"] = attendance
     out["unmet_demand"] = unmet_by_day
     out["diagnostics"] = diagnostics
+    out["model_stats"] = stats
+    out["presolve"] = dict(presolve, bound_reached=unmet_slots == bound["lower_bound_unmet"])
+    if warm is not None:
+        out["warm_start"] = warm
+    if phases is not None:
+        out["phases"] = phases
     out["fairness_summary"] = {
-        "min_hours": int(solver.Value(min_hours)),
-        "max_hours": int(solver.Value(max_hours)),
-        "emp_hours": {employees[e]["name"]: int(solver.Value(emp_hours[e])) for e in range(E)},
-        "employees_used": int(sum(int(solver.Value(w)) for w in worked)),
-        "total_unmet": int(solver.Value(total_slack))
+        "min_hours": slots_to_hours(solver.Value(min_hours), slot_size),
+        "max_hours": slots_to_hours(solver.Value(max_hours), slot_size),
+        "emp_hours": {emp_names[e]: hours_used_week[e] for e in range(E)},
+        "employees_used": int(var_values(values, worked).sum()),
+        "total_unmet": slots_to_hours(unmet_slots, slot_size)
     }
     return out
 
-def solve_single_day(data: dict, day_label: str = "day", time_limit_s: int = 10, slot_size: int = 60):
+def solve_single_day(data: dict, day_label: str = "day", time_limit_s: int = 10, slot_size: int = 60,
+                     num_workers: int = 8, max_memory_mb: int = 0, hint: Optional[List[dict]] = None,
+                     repair: Optional[dict] = None, objective: str = "weighted",
+                     fairness_time_limit_s: Optional[int] = None, break_symmetry: bool = True,
+                     max_segment_minutes: int = 60, formulation: str = "slots",
+                     shift_rules: Optional[dict] = None, backups: bool = True,
+                     presolve_only: bool = False, stop_at_bound: bool = False,
+                     relative_gap_limit: Optional[float] = None, on_solution=None, break_rule: bool = False):
     """Solve staffing for a single day.
+    break_rule: also enforce solve_schedule's 7-hour break rule (see add_break_rule); on when the day
+        is one piece of a week solve (routes/solve_week.py).
+    on_solution: anytime mode; called with a dict for every improving solution found during the
+        search: {phase, time_s, objective, bound, gap, total_unmet, unmet_demand, by_employee}.
+    relative_gap_limit: stop once the objective is within this relative gap of its bound
+        (see solve_with_objective).
+    presolve_only: return only the pre-solve analysis (capacity bound and per-role shortfalls, see
+        routes/solve_presolve.py) without building the model. Every solve reports it under "presolve"
+        and uses its bound to prove the unmet demand optimal early.
+    stop_at_bound: see solve_with_objective.
+    backups: attach up to 5 ranked backup staff to every role block (see BackupFinder).
+    formulation: "slots" (any set of worked segments) or "intervals" (each employee works at most
+        max_shifts_per_day contiguous shifts; see add_shift_intervals). shift_rules overrides
+        SHIFT_DEFAULTS (min/max_shift_minutes, max_shifts_per_day, min_gap_minutes).
+    slot_size / max_segment_minutes: availability and demand are sliced into slot_size-minute slots,
+        then runs of identical slots are merged into segments of up to max_segment_minutes (see
+        compress_slots), so 15-minute slots cost about as many variables as hourly ones.
+    break_symmetry: order interchangeable employees by hours (see add_symmetry_breaking).
+    objective / fairness_time_limit_s: see solve_with_objective.
+    hint: optional prior assignment (see prior_from_result / _fetch_prior_shifts) fed to CP-SAT as hints.
+    repair: {"prior": [entries], "employees": [names/ids], "windows": [{"start","end"}]} freezes every
+        assignment outside the changed employees / affected windows to "prior" (see repair_neighborhood).
     Expected input:
     {
       "day": {"open":"09:00","close":"22:00","roles":{role:int},"peaks":[{"start":"..","end":"..","extra":{role:int}}]},
@@ -555,62 +1146,71 @@ def solve_single_day(data: dict, day_label: str = "day", time_limit_s: int = 10,
         ids.append(emp.get("id"))
         max_week.append(int(emp.get("max_weekly_hours", 40)))
         prev_hours.append(max(0, int(emp.get("prev_hours", 0))))
-        av = emp.get("availability", [])
-        # Accept either list of windows or dict (ignore keys, use the value if list)
-        if isinstance(av, dict):
-            # Try common keys first, else flatten all values
-            if day_label in av:
-                av_windows = av[day_label]
-            else:
-                # merge all windows across keys
-                av_windows = []
-                for v in av.values():
-                    if isinstance(v, list):
-                        av_windows.extend(v)
-        else:
-            av_windows = av
+        av_windows = availability_windows_for_label(emp.get("availability", []), day_label)
         emp_avail[e_i] = availability_slots_for_day(av_windows, day_open_m, day_close_m, slot_size)
         if "roles" in emp and emp["roles"]:
             allowed = set(emp["roles"])
             for r_i, r in enumerate(roles):
                 emp_can_role[e_i][r_i] = 1 if r in allowed else 0
 
-    # Model
+    # Compress runs of identical slots into segments; the model decides per segment.
+    # Hour quantities below (hours_today, caps, fairness) are in slots.
+    segments = compress_slots(cov, emp_avail, max(1, int(max_segment_minutes) // slot_size))
+    slot_seg = slot_segments(segments)
+    G = len(segments)
+    seg_len = [b - a for a, b in segments]
+    seg_avail = [[av[a] for a, _b in segments] for av in emp_avail]
+
+    # Pre-solve: max-flow bound on coverable demand and slots short of qualified staff
+    presolve_t0 = time.perf_counter()
+    caps = [max(0, hours_to_slots(max_week[e] - prev_hours[e], slot_size)) for e in range(E)]
+    bound = capacity_bound([(cov, emp_avail, segments)], roles, emp_can_role, caps)
+    presolve = presolve_summary(bound, role_shortfalls(cov, roles, emp_avail, emp_can_role, day_open_m, slot_size),
+                                slot_size, presolve_t0)
+    if presolve_only:
+        return {"status": "PRESOLVE", "day_label": day_label, "presolve": presolve}
+
+    # Model: assignment vars exist only where the employee is available and qualified
+    build_t0 = time.perf_counter()
     model = cp_model.CpModel()
-    assign = [[[model.NewBoolVar(f"a_e{e}_s{s}_r{r}") for r in range(len(roles))]
-               for s in range(S)] for e in range(E)]
-    slack = [[model.NewIntVar(0, 1000, f"slack_s{s}_r{r}") for r in range(len(roles))] for s in range(S)]
+    assign, assign_index = build_sparse_assign(model, seg_avail, emp_can_role, slot_weights=seg_len)
+    slack = [[model.NewIntVar(0, 1000, f"slack_g{g}_r{r}") for r in range(len(roles))] for g in range(G)]
 
-    # Coverage with slack
-    for s in range(S):
-        for r_name, req in cov[s].items():
+    # Coverage with slack (demand is constant within a segment)
+    by_slot_role = assign_index["by_slot_role"]
+    for g, (a, _b) in enumerate(segments):
+        for r_name, req in cov[a].items():
             r = role_index[r_name]
-            model.Add(sum(assign[e][s][r] for e in range(E)) + slack[s][r] == int(req))
-
-    # Availability, one-role-per-slot, qualification
-    for e in range(E):
-        for s in range(S):
-            if emp_avail[e][s] == 0:
-                for r in range(len(roles)):
-                    model.Add(assign[e][s][r] == 0)
-            model.Add(sum(assign[e][s][r] for r in range(len(roles))) <= 1)
-            for r in range(len(roles)):
-                if emp_can_role[e][r] == 0:
-                    model.Add(assign[e][s][r] == 0)
+            model.Add(sum(by_slot_role.get((g, r), [])) + slack[g][r] == int(req))
+
+    # One role per slot
+    for vs in assign_index["by_emp_slot"].values():
+        if len(vs) > 1:
+            model.AddAtMostOne(vs)
+
+    # Interval formulation: the day's work is one or two contiguous shifts
+    shifts = None
+    rules = dict(SHIFT_DEFAULTS, **(shift_rules or {}))
+    if formulation == "intervals":
+        shifts = add_shift_intervals(model, assign_index, seg_avail, segments, slot_size, **rules)
+    implied_by_shifts = (formulation == "intervals" and rules["max_shift_minutes"] <= 360
+                         and rules["min_gap_minutes"] >= 60)
+    if break_rule and not implied_by_shifts:
+        add_break_rule(model, assign_index["by_emp_slot"], segments, slot_seg, E, slot_size)
 
     # Hours today and weekly cap remaining
-    BIG_M = max(1000, int((day_close_m - day_open_m) / 60 + max(max_week or [40])))
+    BIG_M = max(1000, S + hours_to_slots(max(max_week or [40]), slot_size))
     hours_today = [model.NewIntVar(0, BIG_M, f"hours_e{e}") for e in range(E)]
     for e in range(E):
-        model.Add(hours_today[e] == sum(assign[e][s][r] for s in range(S) for r in range(len(roles))))
-        remaining_cap = max(0, int(max_week[e] - prev_hours[e]))
+        model.Add(hours_today[e] == sum(assign_index["by_emp"].get(e, [])))
+        remaining_cap = max(0, hours_to_slots(max_week[e] - prev_hours[e], slot_size))
         model.Add(hours_today[e] <= remaining_cap)
 
     # Cumulative hours (prev + today) for fairness
     cum_hours = [model.NewIntVar(0, BIG_M, f"cum_e{e}") for e in range(E)]
     for e in range(E):
         # cum = hours_today + prev (constant)
-        model.Add(cum_hours[e] == hours_today[e] + int(prev_hours[e]))
+        model.Add(cum_hours[e] == hours_today[e] + hours_to_slots(prev_hours[e], slot_size))
 
     min_cum = model.NewIntVar(0, BIG_M, "min_cum")
     max_cum = model.NewIntVar(0, BIG_M, "max_cum")
@@ -627,91 +1227,130 @@ def solve_single_day(data: dict, day_label: str = "day", time_limit_s: int = 10,
     W_MIN = 1000
     W_USED = 10
     W_RANGE = 1
-    total_slack = sum(slack[s][r] for s in range(S) for r in range(len(roles)))
-    model.Minimize(SLACK_W * total_slack - (W_MIN * min_cum + W_USED * sum(worked)) + W_RANGE * max_cum)
-
-    solver = cp_model.CpSolver()
-    time_limit_s = int(time_limit_s or 0)
-    if time_limit_s:
-        solver.parameters.max_time_in_seconds = float(time_limit_s)
-    solver.parameters.num_search_workers = 8
-    status = solver.Solve(model)
+    total_slack = sum(seg_len[g] * slack[g][r] for g in range(G) for r in range(len(roles)))
+    fairness = -(W_MIN * min_cum + W_USED * sum(worked)) + W_RANGE * max_cum
+    # Repair: freeze everything outside the affected neighborhood to the published assignment
+    repair_info = None
+    if repair:
+        prior_stats = {"prior_entries": 0, "prior_matched": 0}
+        prior_set = prior_slot_set(repair.get("prior") or [], names, ids, roles, day_open_m, S, slot_size,
+                                   stats=prior_stats)
+        free_emps, free_slots = repair_neighborhood(repair, prior_set, names, ids, day_open_m, S, slot_size)
+        free_segs = {slot_seg[s] for s in free_slots}
+        prior_segs = segment_set(prior_set, segments, slot_seg)
+        fixed = 0
+        changes = []
+        for (e, g, r), v in assign.items():
+            was = (e, g, r) in prior_segs
+            if e in free_emps or g in free_segs:
+                # Inside the neighborhood, each change against the published plan costs more than
+                # any fairness gain, so the diff stays minimal while coverage still comes first.
+                changes.append(seg_len[g] * (1 - v if was else v))
+                continue
+            model.Add(v == (1 if was else 0))
+            fixed += 1
+        W_CHANGE = 10 * W_MIN
+        fairness = fairness + W_CHANGE * sum(changes)
+        repair_info = {
+            "free_employees": sorted(names[e] for e in free_emps),
+            "free_slots": len(free_slots),
+            "fixed_vars": fixed,
+            "free_vars": len(assign) - fixed,
+            **prior_stats,
+        }
+        hint = hint or repair.get("prior")
+
+    # Warm start: hint the previous assignment so re-solves start from it
+    warm = None
+    hinted_hours = defaultdict(int)
+    if hint:
+        warm = {"prior_entries": 0, "prior_matched": 0}
+        prior_set = prior_slot_set(hint, names, ids, roles, day_open_m, S, slot_size, stats=warm)
+        hinted = add_assignment_hints(model, assign, segment_set(prior_set, segments, slot_seg))
+        warm.update(hinted_vars=hinted, prior_slots=len(prior_set))
+        for e, _s, _r in prior_set:
+            hinted_hours[e] += 1
+
+    # Symmetry: same roles, availability, cap and prev_hours make employees interchangeable.
+    # Repairs pin employees to their published shifts, so the ordering would cut valid repairs.
+    symmetry = None
+    if break_symmetry and not repair:
+        classes = interchangeable_classes([
+            (tuple(emp_can_role[e]), tuple(seg_avail[e]), max_week[e], prev_hours[e]) for e in range(E)
+        ])
+        symmetry = add_symmetry_breaking(model, classes, hours_today, hinted_hours)
+
+    stats = model_stats(model, len(assign), E * S * len(roles), time.perf_counter() - build_t0)
+    stats["slots"] = S
+    stats["segments"] = G
+    stats["formulation"] = formulation
+    if symmetry is not None:
+        stats["symmetry"] = symmetry
+
+    slack_flat = [v for row in slack for v in row]
+
+    def solution_event(values, info):
+        # Intermediate schedule for anytime callers: who works when, and what is still uncovered
+        on_now = dense_assignment(values, assign, segments, E, len(roles)).any(axis=2)
+        slack_now = expand_segments(var_values(values, slack_flat).reshape(G, len(roles)), segments)
+        unmet_now = {roles[r]: groups for r, groups in slack_groups(slack_now, day_open_m, slot_size).items()}
+        on_solution(dict(
+            info,
+            total_unmet=slots_to_hours(int(slack_now.sum()), slot_size),
+            unmet_demand={day_label: unmet_now} if unmet_now else {},
+            by_employee={names[e]: [{"start": a, "end": b} for a, b in ivs]
+                         for e, ivs in sorted(employee_intervals(on_now, day_open_m, slot_size).items())},
+        ))
+
+    solver, status, phases = solve_with_objective(
+        model, total_slack, fairness, SLACK_W, objective, time_limit_s, fairness_time_limit_s,
+        num_workers, max_memory_mb, bound["lower_bound_unmet"], stop_at_bound, relative_gap_limit,
+        solution_event if on_solution is not None else None)
     if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
-        return {"status": "INFEASIBLE"}
-
-    # Build outputs
-    # Per-role assignments per slot -> merged blocks
-    per_role_slots = []
-    per_role_slack = []
-    for r in range(len(roles)):
-        names_per_slot = []
-        slack_per_slot = []
-        for s in range(S):
-            assigned_names = [names[e] for e in range(E) if solver.Value(assign[e][s][r]) == 1]
-            names_per_slot.append(assigned_names)
-            slack_per_slot.append(int(solver.Value(slack[s][r])))
-        per_role_slots.append(names_per_slot)
-        per_role_slack.append(slack_per_slot)
-
-    role_blocks = merge_shift_blocks_by_role(per_role_slots, day_open_m, slot_size)
-    day_blocks = to_day_blocks_from_role_blocks(role_blocks)
+        return {"status": "INFEASIBLE", "presolve": presolve}
 
-    # Precompute assignment occupancy per employee per slot for backup checks
-    assigned_any = [[0]*S for _ in range(E)]
-    for e in range(E):
-        for s in range(S):
-            if any(solver.Value(assign[e][s][r]) == 1 for r in range(len(roles))):
-                assigned_any[e][s] = 1
+    # Build outputs from one bulk read of the solution (see routes/solve_extract.py)
+    values = solution_values(solver)
+    X = dense_assignment(values, assign, segments, E, len(roles))
+    on = X.any(axis=2)
+    slack_val = expand_segments(var_values(values, slack_flat).reshape(G, len(roles)), segments)
+
+    # Per-role blocks (runs of slots with the same staff) and the day's open blocks
+    role_blocks = role_blocks_from_array(X, names, day_open_m, slot_size)
+    day_blocks = to_day_blocks_from_role_blocks(role_blocks)
 
-    # Get numeric values for fairness metrics to help rank backups
-    hours_today_val = [int(solver.Value(hours_today[e])) for e in range(E)]
-    cum_hours_val = [int(solver.Value(hours_today[e]) + prev_hours[e]) for e in range(E)]
+    # Fairness metrics, also used to rank backups (in hours)
+    hours_today_val = [slots_to_hours(h, slot_size) for h in var_values(values, hours_today).tolist()]
+    cum_hours_val = [hours_today_val[e] + prev_hours[e] for e in range(E)]
+    remaining = [max(0, max_week[e] - prev_hours[e] - hours_today_val[e]) for e in range(E)]
 
-    # Compute backups for each role block: list up to 5 candidates qualified, available, and unassigned for full block
+    # Backups for each role block (only when requested): up to 5 qualified staff, available and
+    # unassigned for the whole block. Ranked by more remaining capacity, then lower cumulative hours
+    # for fairness, then name.
     role_blocks_with_backups = {}
+    if backups:
+        finder = BackupFinder(np.array(emp_can_role, dtype=bool), np.array(emp_avail, dtype=bool).reshape(E, S), on,
+                              names, ids, remaining, cum_hours_val)
     for r_idx, blocks in role_blocks.items():
-        r_name = roles[r_idx]
+        if not backups:
+            role_blocks_with_backups[roles[r_idx]] = blocks
+            continue
         new_blocks = []
         for b in blocks:
-            b_start = parse_time_token(b["start"]) 
-            b_end = parse_time_token(b["end"]) 
-            s0 = max(0, (b_start - day_open_m) // slot_size)
-            s1 = max(s0, (b_end - day_open_m + (slot_size-1)) // slot_size)
-            assigned_set = set(b.get("employees", []))
-            candidates = []
-            for e in range(E):
-                nm = names[e]
-                eid = ids[e]
-                if nm in assigned_set:
-                    continue
-                if emp_can_role[e][r_idx] == 0:
-                    continue
-                if all(emp_avail[e][s] == 1 for s in range(int(s0), int(s1))) and \
-                   all(assigned_any[e][s] == 0 for s in range(int(s0), int(s1))):
-                    remaining_cap = int(max(0, max_week[e] - prev_hours[e] - hours_today_val[e]))
-                    candidates.append((remaining_cap, cum_hours_val[e], nm, eid))
-            # Sort: more remaining capacity first, then lower cumulative hours for fairness, then name
-            candidates.sort(key=lambda x: (-x[0], x[1], x[2]))
-            backups = [{"id": eid, "name": nm} for _,__, nm, eid in candidates[:5]]
-            nb = dict(b)
-            nb["backups"] = backups
-            new_blocks.append(nb)
-        role_blocks_with_backups[r_name] = new_blocks
-
-    # By-employee intervals for the day
-    by_employee = {}
-    for e in range(E):
-        on = [1 if any(solver.Value(assign[e][s][r]) == 1 for r in range(len(roles))) else 0 for s in range(S)]
-        intervals = contiguous_intervals_from_slots(on, day_open_m, slot_size)
-        if intervals:
-            by_employee[names[e]] = [{"start": a, "end": b} for a, b in intervals]
+            s0 = max(0, (parse_time_token(b["start"]) - day_open_m) // slot_size)
+            s1 = max(s0, (parse_time_token(b["end"]) - day_open_m + (slot_size-1)) // slot_size)
+            new_blocks.append(dict(b, backups=finder.backups(r_idx, s0, s1, exclude=b["employees"])))
+        role_blocks_with_backups[roles[r_idx]] = new_blocks
+
+    # By-employee intervals for the day (the shifts themselves in the interval formulation)
+    if shifts is not None:
+        emp_intervals = shifts_from_solution(solver, shifts, day_open_m, slot_size)
+    else:
+        emp_intervals = employee_intervals(on, day_open_m, slot_size)
+    by_employee = {names[e]: [{"start": a, "end": b} for a, b in ivs] for e, ivs in sorted(emp_intervals.items())}
 
     # Unmet intervals (by role)
-    unmet = {}
-    for r_name, r_idx in role_index.items():
-        groups = group_slack_intervals(per_role_slack[r_idx], day_open_m, slot_size)
-        if groups:
-            unmet[r_name] = groups
+    unmet = {roles[r]: groups for r, groups in slack_groups(slack_val, day_open_m, slot_size).items()}
 
     out = {
         "status": "FEASIBLE" if status == cp_model.FEASIBLE else "OPTIMAL",
@@ -724,15 +1363,23 @@ def solve_single_day(data: dict, day_label: str = "day", time_limit_s: int = 10,
         "by_employee": {name: {day_label: by_employee.get(name, [])} for name in names},
         "unmet_demand": {day_label: unmet} if unmet else {},
         "fairness_summary": {
-            "min_cum_hours": int(solver.Value(min_cum)),
-            "max_cum_hours": int(solver.Value(max_cum)),
-            "emp_hours_today": {names[e]: int(solver.Value(hours_today[e])) for e in range(E)},
+            "min_cum_hours": slots_to_hours(solver.Value(min_cum), slot_size),
+            "max_cum_hours": slots_to_hours(solver.Value(max_cum), slot_size),
+            "emp_hours_today": {names[e]: hours_today_val[e] for e in range(E)},
             "prev_hours": {names[e]: int(prev_hours[e]) for e in range(E)},
-            "cum_hours": {names[e]: int(solver.Value(hours_today[e]) + prev_hours[e]) for e in range(E)},
-            "employees_used": int(sum(int(solver.Value(w)) for w in worked)),
-            "total_unmet": int(solver.Value(total_slack))
-        }
+            "cum_hours": {names[e]: cum_hours_val[e] for e in range(E)},
+            "employees_used": int(var_values(values, worked).sum()),
+            "total_unmet": slots_to_hours(int(slack_val.sum()), slot_size)
+        },
+        "model_stats": stats,
+        "presolve": dict(presolve, bound_reached=int(slack_val.sum()) == bound["lower_bound_unmet"]),
     }
+    if warm is not None:
+        out["warm_start"] = warm
+    if repair_info is not None:
+        out["repair"] = repair_info
+    if phases is not None:
+        out["phases"] = phases
     return out
 
 def print_attendance(attendance: Dict[str, Dict[str, List[dict]]]):
@@ -795,12 +1442,13 @@ def _get_dburl() -> Optional[str]:
     return os.getenv("DBURL")
 
 def _conn():
-    dburl = _get_dburl()
-    if not dburl:
+    if not _get_dburl():
         raise RuntimeError("DBURL missing in env")
     if not psycopg:
         raise RuntimeError("psycopg not available")
-    return psycopg.connect(dburl)
+    # Pooled connection shared with every blueprint (db.py); commits when the with-block exits cleanly
+    from db import connection
+    return connection()
 
 def _weekday_to_iso(label: str) -> str:
     s = (label or "").strip().lower()
@@ -875,19 +1523,37 @@ def _normalize_availability_for_day(av_json: any, day_label: str) -> List[str]:
         return out
     return []
 
+# Select-list column with the lower-cased role names a staff row (alias st) is qualified for, or NULL
+SQL_QUALIFIED_ROLES = """
+    (SELECT array_agg(lower(r.role_name)) FROM staff_roles sr JOIN roles r ON r.id = sr.role_id
+      WHERE sr.staff_id = st.id) AS qualified_roles
+"""
+
+def qualified_roles(role_names: List[str], qualified: Optional[List[str]]) -> List[str]:
+    """The requested roles a staff member may take (role names match case-insensitively).
+    Staff without staff_roles rows may take every requested role.
+    """
+    if not qualified:
+        return list(role_names)
+    allowed = {q.strip().lower() for q in qualified if q}
+    return [r for r in role_names if r.strip().lower() in allowed]
+
 def _fetch_staff_for_shop(shop_id: int, day_label: str, role_names: List[str], date_iso: Optional[str]) -> List[dict]:
-    """Fetch staff rows and adapt to solver employees format. Optionally compute prev_hours if date is provided (YYYY-MM-DD)."""
+    """Fetch staff rows and adapt to solver employees format. Optionally compute prev_hours if date is provided (YYYY-MM-DD).
+    Staff qualified (staff_roles) for none of role_names are left out.
+    """
+    from db import fetch_all
+
     _load_env()
-    sql = """
-        SELECT id, name, availability, max_hours_per_week
-        FROM staff
-        WHERE shop_id = %s
-        ORDER BY name;
+    sql = f"""
+        SELECT st.id, st.name, st.availability, st.max_hours_per_week, {SQL_QUALIFIED_ROLES}
+        FROM staff st
+        WHERE st.shop_id = %s
+        ORDER BY st.name;
     """
     staff_rows: List[dict] = []
     with _conn() as conn, conn.cursor(row_factory=dict_row) as cur:
-        cur.execute(sql, (int(shop_id),))
-        staff_rows = cur.fetchall() or []
+        staff_rows = fetch_all(sql, (int(shop_id),), prepare=True, conn=conn)
 
         # Optionally compute previous hours for the same ISO week up to the given date (exclusive)
         prev_by_id: Dict[int, float] = {}
@@ -925,13 +1591,16 @@ def _fetch_staff_for_shop(shop_id: int, day_label: str, role_names: List[str], d
     employees: List[dict] = []
     iso_day = _weekday_to_iso(day_label)
     for r in staff_rows:
+        # Only qualified roles, so the model gets no variables for the others
+        roles = qualified_roles(role_names, r.get("qualified_roles"))
+        if not roles:
+            continue
         avail_raw = r.get("availability")
         day_ranges = _normalize_availability_for_day(avail_raw, iso_day)
         employees.append({
             "id": int(r["id"]),
             "name": r.get("name") or f"staff-{r['id']}",
-            # Eligible for all provided roles (adjust if you add a mapping later)
-            "roles": list(role_names),
+            "roles": roles,
             "max_weekly_hours": int(r.get("max_hours_per_week") or 40),
             "prev_hours": float(0.0 if not date_iso else (prev_by_id.get(int(r["id"])) or 0.0)),
             # Provide a dict keyed by the actual day label so the solver picks it
@@ -939,6 +1608,335 @@ def _fetch_staff_for_shop(shop_id: int, day_label: str, role_names: List[str], d
         })
     return employees
 
+def _parse_solver_options(body: dict, args: dict, default_time_limit: int = 10) -> Tuple[dict, List[str]]:
+    """Solver options shared by /api/solve and /api/solve/week; returns (options, errors)."""
+    time_limit = args.get("time_limit", body.get("time_limit", default_time_limit))
+    objective = args.get("objective") or body.get("objective") or "weighted"
+    fairness_time_limit = args.get("fairness_time_limit", body.get("fairness_time_limit"))
+    relative_gap = args.get("relative_gap", body.get("relative_gap"))
+    slot_size = args.get("slot_size", body.get("slot_size", 60))
+    formulation = args.get("formulation") or body.get("formulation") or "slots"
+    shift_rules = body.get("shift_rules")
+
+    def flag(name):
+        v = args.get(name, body.get(name, False))
+        return v.strip().lower() in ("1", "true", "yes") if isinstance(v, str) else bool(v)
+
+    errors = []
+    try:
+        time_limit = int(time_limit)
+    except (TypeError, ValueError):
+        errors.append("time_limit must be int seconds")
+    try:
+        slot_size = int(slot_size)
+    except (TypeError, ValueError):
+        slot_size = None
+    if slot_size not in SLOT_SIZES:
+        errors.append(f"slot_size must be one of {list(SLOT_SIZES)} minutes")
+    if formulation not in FORMULATIONS:
+        errors.append(f"formulation must be one of {list(FORMULATIONS)}")
+    if shift_rules is not None:
+        if not isinstance(shift_rules, dict) or set(shift_rules) - set(SHIFT_DEFAULTS) or \
+           not all(isinstance(v, int) and v >= 0 for v in shift_rules.values()):
+            errors.append(f"shift_rules must be an object with int values for {list(SHIFT_DEFAULTS)}")
+    if objective not in OBJECTIVE_MODES:
+        errors.append(f"objective must be one of {list(OBJECTIVE_MODES)}")
+    if fairness_time_limit is not None:
+        try:
+            fairness_time_limit = int(fairness_time_limit)
+        except (TypeError, ValueError):
+            errors.append("fairness_time_limit must be int seconds")
+    if relative_gap is not None:
+        try:
+            relative_gap = float(relative_gap)
+            if not 0 <= relative_gap < 1:
+                raise ValueError
+        except (TypeError, ValueError):
+            errors.append("relative_gap must be a number in [0, 1), e.g. 0.01")
+    return {
+        "time_limit": time_limit,
+        "objective": objective,
+        "fairness_time_limit": fairness_time_limit,
+        "relative_gap": relative_gap or None,
+        "slot_size": slot_size,
+        "formulation": formulation,
+        "shift_rules": shift_rules or None,
+        "backups": flag("backups"),
+        "presolve_only": flag("presolve_only"),
+        "stop_at_bound": flag("stop_at_bound"),
+    }, errors
+
+def _parse_solve_request(body: dict, args: Optional[dict] = None) -> Tuple[Optional[dict], List[str]]:
+    """Validate a /api/solve style body and return (solve_request, errors).
+
+    The solve request is plain JSON so it can be stored in the jobs table and replayed by a worker.
+    """
+    args = args or {}
+    # Accept both weekday and day_label
+    weekday = args.get("weekday") or body.get("weekday") or args.get("day_label") or body.get("day_label")
+    open_t = body.get("open")
+    close_t = body.get("close")
+    roles = body.get("roles")
+    peaks = body.get("peaks") or []
+    shop_id = body.get("shop_id")
+    date_iso = body.get("date")  # optional; ISO like YYYY-MM-DD
+    mode = args.get("mode") or body.get("mode") or "exact"
+    # Repairs only touch a small neighborhood, so they default to a 1 s budget
+    options, errors = _parse_solver_options(body, args, 1 if body.get("repair") else 10)
+
+    # Validate minimal payload
+    if not isinstance(shop_id, int):
+        errors.append("shop_id must be int")
+    if not isinstance(open_t, str):
+        errors.append("open must be HH:MM string")
+    if not isinstance(close_t, str):
+        errors.append("close must be HH:MM string")
+    if not isinstance(roles, dict) or not roles:
+        errors.append("roles must be a non-empty object {role:int}")
+    if not isinstance(peaks, list) and peaks is not None:
+        errors.append("peaks must be a list")
+    if not isinstance(weekday, str) or not weekday.strip():
+        errors.append("weekday (or day_label) must be provided")
+    if date_iso is not None and not isinstance(date_iso, str):
+        errors.append("date must be YYYY-MM-DD string")
+    prior = body.get("prior")
+    warm_start = bool(body.get("warm_start"))
+    if prior is not None and not isinstance(prior, (dict, list)):
+        errors.append("prior must be a previous solve result or a list of {employee,role,start,end}")
+    if warm_start and not date_iso:
+        errors.append("warm_start requires date (hints come from that day's shifts)")
+    repair = body.get("repair")
+    if repair is not None:
+        if not isinstance(repair, dict) or not (repair.get("employees") or repair.get("windows")):
+            errors.append("repair must be {employees: [...], windows: [...]} with at least one entry")
+        elif not date_iso:
+            errors.append("repair requires date (the published shifts of that day are repaired)")
+    if mode not in SOLVE_MODES:
+        errors.append(f"mode must be one of {list(SOLVE_MODES)}")
+    elif mode == "fast" and repair:
+        errors.append("repair needs the exact solver (mode exact or auto)")
+    if errors:
+        return None, errors
+
+    # Assemble day config
+    day_cfg = {"open": open_t, "close": close_t, "roles": roles}
+    if peaks:
+        day_cfg["peaks"] = peaks
+
+    iso_day = _weekday_to_iso(weekday)
+    # A previous result is flattened to entries here so the request stays small and replayable
+    if isinstance(prior, dict):
+        prior = prior_from_result(prior, prior.get("day_label") or iso_day)
+
+    return dict(
+        options,
+        shop_id=int(shop_id),
+        day_label=iso_day,
+        day=day_cfg,
+        date=date_iso,
+        mode=mode,
+        prior=prior or None,
+        warm_start=warm_start,
+        repair={"employees": list(repair.get("employees") or []), "windows": list(repair.get("windows") or [])}
+               if repair else None,
+    ), []
+
+def _build_single_day_payload(req: dict) -> dict:
+    """Load employees for a parsed solve request and return the solve_single_day payload."""
+    role_names = list(req["day"]["roles"])
+    role_names += sorted({r for p in req["day"].get("peaks") or [] for r in p.get("extra", {})} - set(role_names))
+    employees = _fetch_staff_for_shop(req["shop_id"], req["day_label"], role_names, req.get("date"))
+    return {"day": req["day"], "employees": employees}
+
+def _prior_for_request(req: dict) -> Optional[List[dict]]:
+    """Warm-start assignment: an explicit prior wins, else the day's shifts rows when warm_start is set."""
+    if req.get("prior"):
+        return req["prior"]
+    if req.get("warm_start") and req.get("date"):
+        return _fetch_prior_shifts(req["shop_id"], req["date"]) or None
+    return None
+
+def _fast_tier(payload: dict, req: dict) -> Optional[dict]:
+    """The greedy result for mode=fast, or for mode=auto when the solver pool is saturated or the
+    shop is small and greedy already covers all demand. None means: run CP-SAT.
+    """
+    mode = req.get("mode", "exact")
+    if mode == "exact" or req.get("repair"):
+        return None
+    from routes.solve_fast import AUTO_FAST_MAX_STAFF, solve_single_day_fast
+    from routes.solve_pool import POOL_SIZE, active_solves
+
+    quick = solve_single_day_fast(payload, day_label=req["day_label"], slot_size=int(req.get("slot_size") or 60),
+                                  backups=bool(req.get("backups")))
+    if mode == "fast":
+        return dict(quick, engine="fast")
+    if active_solves() >= POOL_SIZE:
+        return dict(quick, engine="fast", engine_reason="solver_busy")
+    covered = quick.get("fairness_summary", {}).get("total_unmet") == 0
+    if covered and len(payload.get("employees") or []) <= AUTO_FAST_MAX_STAFF:
+        return dict(quick, engine="fast", engine_reason="trivially_feasible")
+    return None
+
+def _solve_opts(req: dict, hint: Optional[List[dict]] = None, current: Optional[List[dict]] = None) -> dict:
+    """solve_single_day keyword options for a parsed request."""
+    # Only non-default options go into the opts (and so the cache key)
+    opts = {"time_limit_s": int(req["time_limit"]), "backups": bool(req.get("backups"))}
+    if int(req.get("slot_size") or 60) != 60:
+        opts["slot_size"] = int(req["slot_size"])
+    if req.get("formulation", "slots") != "slots":
+        opts["formulation"] = req["formulation"]
+        if req.get("shift_rules"):
+            opts["shift_rules"] = req["shift_rules"]
+    if req.get("objective", "weighted") != "weighted":
+        opts["objective"] = req["objective"]
+        if req.get("fairness_time_limit") is not None:
+            opts["fairness_time_limit_s"] = int(req["fairness_time_limit"])
+    if req.get("relative_gap"):
+        opts["relative_gap_limit"] = float(req["relative_gap"])
+    if req.get("stop_at_bound"):
+        opts["stop_at_bound"] = True
+    if hint:
+        opts["hint"] = hint
+    if req.get("repair"):
+        opts["repair"] = dict(req["repair"], prior=current or [])
+    return opts
+
+def _solve_payload(payload: dict, req: dict, hint: Optional[List[dict]] = None,
+                   current: Optional[List[dict]] = None) -> dict:
+    """Solve a single-day payload through the result cache and the shared process pool.
+    current: the day's shifts rows; required in repair mode, where the result also gets a row diff.
+    """
+    from routes.solve_cache import cached_solve
+    from routes.solve_pool import solve_in_pool
+
+    if req.get("presolve_only"):
+        # Milliseconds of max-flow, no model: answer inline, outside the pool and the cache
+        return dict(solve_single_day(payload, day_label=req["day_label"], slot_size=int(req.get("slot_size") or 60),
+                                     presolve_only=True), engine="presolve")
+    fast = _fast_tier(payload, req)
+    if fast is not None:
+        return fast
+
+    def pooled(p, day_label, **opts):
+        return solve_in_pool("single_day", p, day_label=day_label, **opts)
+
+    opts = _solve_opts(req, hint, current)
+    result = dict(cached_solve(pooled, payload, req["day_label"], **opts), engine="exact")
+    if req.get("repair") and result.get("status") in ("OPTIMAL", "FEASIBLE"):
+        new_entries = assignment_entries(result, req["day_label"], payload["employees"])
+        result = dict(result, diff=diff_assignment(new_entries, current or []))
+    return result
+
+def _stream_payload(payload: dict, req: dict, hint: Optional[List[dict]] = None,
+                    current: Optional[List[dict]] = None):
+    """Anytime variant of _solve_payload: yields (event, data) pairs.
+
+    "presolve" comes first (the capacity bound, in milliseconds), then one "solution" per improving
+    CP-SAT solution ({phase, time_s, objective, bound, gap, total_unmet, unmet_demand, by_employee}),
+    then "result" with the same body /api/solve returns. Fast-tier answers and cache hits go
+    straight to "result".
+    """
+    from routes.solve_cache import solve_cache, solve_cache_key
+    from routes.solve_pool import stream_in_pool
+
+    day_label = req["day_label"]
+    pre = solve_single_day(payload, day_label=day_label, slot_size=int(req.get("slot_size") or 60), presolve_only=True)
+    yield "presolve", pre.get("presolve") or pre
+    if req.get("presolve_only"):
+        yield "result", dict(pre, engine="presolve")
+        return
+    fast = _fast_tier(payload, req)
+    if fast is not None:
+        yield "result", fast
+        return
+
+    opts = _solve_opts(req, hint, current)
+    key = solve_cache_key(payload, day_label, **opts)
+    result = solve_cache.get(key)
+    if result is not None:
+        result = dict(result, cache={"hit": True, "key": key})
+    else:
+        for event, data in stream_in_pool("single_day", payload, day_label=day_label, **opts):
+            if event == "result":
+                result = data
+                break
+            yield event, data
+        solve_cache.put(key, result)
+        result = dict(result, cache={"hit": False, "key": key})
+    result = dict(result, engine="exact")
+    if req.get("repair") and result.get("status") in ("OPTIMAL", "FEASIBLE"):
+        new_entries = assignment_entries(result, day_label, payload["employees"])
+        result = dict(result, diff=diff_assignment(new_entries, current or []))
+    yield "result", result
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'), default=str)}\n\n"
+
+def _current_shifts_for_request(req: dict) -> Optional[List[dict]]:
+    if req.get("repair") and req.get("date"):
+        return _fetch_prior_shifts(req["shop_id"], req["date"])
+    return None
+
+def run_solve_request(req: dict) -> dict:
+    """Fetch staff and solve a parsed request end to end (used by the job worker)."""
+    payload = _build_single_day_payload(req)
+    return _solve_payload(payload, req, _prior_for_request(req), _current_shifts_for_request(req))
+
+def _day_window_utc(date_iso: str) -> Tuple[datetime, datetime]:
+    day_dt = datetime.fromisoformat(date_iso)
+    if day_dt.tzinfo is None:
+        day_dt = day_dt.replace(tzinfo=timezone.utc)
+    day_start = day_dt.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    return day_start, day_start + timedelta(days=1)
+
+SQL_DAY_SHIFTS = """
+    SELECT s.id AS shift_id, s.staff_id, st.name AS employee, s.role_id, r.role_name AS role,
+           s.shift_start, s.shift_end, s.status
+    FROM shifts s
+    JOIN staff st ON st.id = s.staff_id
+    JOIN roles r  ON r.id = s.role_id
+    WHERE st.shop_id = %s
+      AND s.shift_range && tstzrange(%s, %s)
+      -- (day start - db.SHIFT_MAX_SPAN, day end): prunes to the day's month partitions
+      AND s.shift_start > %s
+      AND s.shift_start < %s
+    ORDER BY s.staff_id, s.shift_start
+"""
+
+def read_day_shifts(cur, shop_id: int, date_iso: str, lock: bool = False, full: bool = False) -> List[dict]:
+    """The shop's shifts rows on date_iso as prior-assignment entries (times clipped to the day, UTC).
+    cur must use dict_row; lock takes FOR UPDATE on the shift rows; full also returns the unclipped
+    shift_start/shift_end and the status.
+    """
+    from db import SHIFT_MAX_SPAN
+
+    day_start, day_end = _day_window_utc(date_iso)
+    cur.execute(SQL_DAY_SHIFTS + (" FOR UPDATE OF s" if lock else ""),
+                (int(shop_id), day_start, day_end, day_start - SHIFT_MAX_SPAN, day_end))
+    out = []
+    for r in cur.fetchall() or []:
+        st = max(r["shift_start"], day_start).astimezone(timezone.utc)
+        en = min(r["shift_end"], day_end).astimezone(timezone.utc)
+        extra = {k: r[k] for k in ("shift_start", "shift_end", "status")} if full else {}
+        out.append({
+            **extra,
+            "shift_id": r["shift_id"],
+            "staff_id": r["staff_id"],
+            "employee": r["employee"],
+            "role_id": r["role_id"],
+            "role": r["role"],
+            "start": st.strftime("%H:%M"),
+            # A shift running to (or past) midnight ends at the close of this day
+            "end": "24:00" if r["shift_end"] >= day_end else en.strftime("%H:%M"),
+        })
+    return out
+
+def _fetch_prior_shifts(shop_id: int, date_iso: str) -> List[dict]:
+    """Existing shifts rows for the shop on date_iso as prior-assignment entries (see read_day_shifts)."""
+    _load_env()
+    with _conn() as conn, conn.cursor(row_factory=dict_row) as cur:
+        return read_day_shifts(cur, shop_id, date_iso)
+
 # Create blueprint if Flask is available
 if Blueprint is not None:
     # Use unique blueprint name and prefix under /api
@@ -958,74 +1956,132 @@ if Blueprint is not None:
           "peaks": [ {"start":"10:00","end":"12:00","extra":{"cashier":1}} ],  # optional
           "date": "2025-09-27"           # optional; if provided, previous hours are computed
         }
+        Staff only take the roles they are qualified for in staff_roles (any role when they have none).
 
         Optional query/body:
           - day_label/weekday: which weekday to solve (e.g., monday)
           - time_limit: solver time limit seconds (default 10)
+          - objective: "weighted" (default) or "lexicographic": minimize unmet demand first, then
+              fairness with slack fixed; the response gets per-phase "phases" [{phase,status,time_s,...}]
+          - fairness_time_limit: lexicographic phase-2 budget in seconds (default: time_limit)
+          - mode: "exact" (default, CP-SAT), "fast" (greedy planner, routes/solve_fast.py, well under
+              100 ms) or "auto" (greedy when the solver pool is saturated, or when the shop is small
+              and greedy covers all demand; otherwise exact). The result's "engine" says which ran.
+          - backups: true to attach up to 5 ranked backup staff to each role block (off by default)
+          - presolve_only: true to return only the pre-solve "presolve" section in milliseconds:
+              lower_bound_unmet (hours no schedule can cover) and per-role "shortfalls" where demand
+              exceeds the qualified staff available. Every exact solve reports the same section.
+          - stop_at_bound: true to return the first solution whose unmet demand reaches that bound
+              instead of spending the rest of time_limit on fairness
+          - relative_gap: stop once the objective is within this fraction of its proven bound
+              (e.g. 0.01); the status is then FEASIBLE. POST /api/solve/stream streams each
+              improving solution while the solver runs.
+          - formulation: "slots" (default) or "intervals": every employee works at most two contiguous
+              shifts; "shift_rules" overrides {"min_shift_minutes":120,"max_shift_minutes":360,
+              "max_shifts_per_day":2,"min_gap_minutes":60}
+          - slot_size: 15, 30 or 60 (default) minute slots; identical slots are merged into
+              segments of up to an hour, so finer slots only add variables where demand or
+              availability actually changes
+          - prior: a previous /api/solve result (or [{employee,role,start,end}]) used as solver hints
+          - warm_start: true to hint from the shifts already stored for "date"; the response's
+              "warm_start" reports prior_entries/prior_matched so an unmatched hint is visible
+          - repair: {"employees": [staff ids or names], "windows": [{"start":"14:00","end":"18:00"}]}
+              re-plans only the changed staff / windows around the shifts stored for "date", keeps the
+              rest frozen, and returns a "diff" of shift rows to add/remove (time_limit defaults to 1)
+
+        Long solves should go through POST /api/solve/jobs instead (see routes/solve_jobs.py).
         """
         if not request.is_json:
             return jsonify({"error": "Content-Type must be application/json"}), 415
 
         body = request.get_json(silent=True) or {}
-        # Accept both weekday and day_label
-        weekday = request.args.get("weekday") or body.get("weekday") or request.args.get("day_label") or body.get("day_label")
-        open_t = body.get("open")
-        close_t = body.get("close")
-        roles = body.get("roles")
-        peaks = body.get("peaks") or []
-        shop_id = body.get("shop_id")
-        date_iso = body.get("date")  # optional; ISO like YYYY-MM-DD
-        time_limit = request.args.get("time_limit", body.get("time_limit", 10))
-
-        # Validate minimal payload
-        errors = []
-        if not isinstance(shop_id, int):
-            errors.append("shop_id must be int")
-        if not isinstance(open_t, str):
-            errors.append("open must be HH:MM string")
-        if not isinstance(close_t, str):
-            errors.append("close must be HH:MM string")
-        if not isinstance(roles, dict) or not roles:
-            errors.append("roles must be a non-empty object {role:int}")
-        if not isinstance(peaks, list) and peaks is not None:
-            errors.append("peaks must be a list")
-        if not isinstance(weekday, str) or not weekday.strip():
-            errors.append("weekday (or day_label) must be provided")
+        req, errors = _parse_solve_request(body, request.args)
         if errors:
             return jsonify({"error": "validation_failed", "details": errors}), 400
 
-        iso_day = _weekday_to_iso(weekday)
-
-        # Assemble day config
-        day_cfg = {"open": open_t, "close": close_t, "roles": roles}
-        if peaks:
-            day_cfg["peaks"] = peaks
-
         try:
             # Build employees automatically from DB
-            employees = _fetch_staff_for_shop(int(shop_id), iso_day, list(roles.keys()), date_iso)
+            single_day_payload = _build_single_day_payload(req)
+            hint = _prior_for_request(req)
+            current = _current_shifts_for_request(req)
         except Exception as ex:
             return jsonify({"error": "db_error", "detail": str(ex)}), 500
 
-        # Prepare payload for solver
-        single_day_payload = {"day": day_cfg, "employees": employees}
         try:
-            result = solve_single_day(single_day_payload, day_label=iso_day, time_limit_s=int(time_limit))
+            # Identical problems are served from the cache; misses solve in the shared process pool
+            result = _solve_payload(single_day_payload, req, hint, current)
         except Exception as ex:
             return jsonify({"error": "Failed to compute schedule", "detail": str(ex)}), 500
 
         return jsonify(result), 200
+
+    @solve_bp.post("/solve/stream")
+    def schedule_stream_endpoint():
+        """
+        POST /api/solve/stream
+        Same body and options as POST /api/solve, answered as server-sent events (text/event-stream):
+          event: presolve   the pre-solve capacity bound, immediately
+          event: solution   every improving solution: {"phase","time_s","objective","bound","gap",
+                            "total_unmet","unmet_demand","by_employee"}
+          event: result     the final /api/solve body (also for fast-tier answers and cache hits)
+          event: error      {"error","detail"} if the solve fails mid-stream
+        Combine with relative_gap (e.g. 0.02) to end the solve once it is within 2% of its bound.
+        """
+        if not request.is_json:
+            return jsonify({"error": "Content-Type must be application/json"}), 415
+
+        body = request.get_json(silent=True) or {}
+        req, errors = _parse_solve_request(body, request.args)
+        if errors:
+            return jsonify({"error": "validation_failed", "details": errors}), 400
+
+        try:
+            single_day_payload = _build_single_day_payload(req)
+            hint = _prior_for_request(req)
+            current = _current_shifts_for_request(req)
+        except Exception as ex:
+            return jsonify({"error": "db_error", "detail": str(ex)}), 500
+
+        def events():
+            try:
+                for event, data in _stream_payload(single_day_payload, req, hint, current):
+                    yield _sse(event, data)
+            except Exception as ex:
+                yield _sse("error", {"error": "Failed to compute schedule", "detail": str(ex)})
+
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        return Response(stream_with_context(events()), mimetype="text/event-stream", headers=headers)
+
+    @solve_bp.get("/solve/cache")
+    def solve_cache_stats():
+        """GET /api/solve/cache -> size, hit/miss and eviction counters of this process's solve cache."""
+        # Imported here: routes.solve_cache imports this module, which breaks `python -m routes.solve`
+        from routes.solve_cache import solve_cache
+        return jsonify(solve_cache.stats())
 else:
     schedule_bp = None  # Flask not installed; CLI usage still works.
 
 # ---------- CLI entrypoint ----------
 
 def main():
+    # `python -m routes.solve worker` runs the async job worker instead of a one-off solve
+    if sys.argv[1:2] == ["worker"]:
+        from routes.solve_jobs import worker_main
+        return worker_main(sys.argv[2:])
+    # `python -m routes.solve batch` plans next week for every shop (see routes/solve_batch.py)
+    if sys.argv[1:2] == ["batch"]:
+        from routes.solve_batch import batch_main
+        return batch_main(sys.argv[2:])
+
     parser = argparse.ArgumentParser()
     parser.add_argument("--input", type=str, default="", help="Path to input JSON (single day preferred)")
     parser.add_argument("--output", type=str, default="", help="Path to write output JSON")
     parser.add_argument("--day_label", type=str, default="day", help="Label for the day (e.g., monday or 2025-09-26)")
     parser.add_argument("--time_limit", type=int, default=10, help="Solver time limit (s)")
+    parser.add_argument("--objective", choices=OBJECTIVE_MODES, default="weighted",
+                        help="weighted: one big-M solve; lexicographic: slack first, then fairness")
+    parser.add_argument("--fairness_time_limit", type=int, default=None, help="Lexicographic phase-2 time limit (s)")
+    parser.add_argument("--presolve", action="store_true", help="Print the pre-solve capacity bound only")
     args = parser.parse_args()
 
     if args.input:
@@ -1056,7 +2112,9 @@ def main():
             ]
         }
 
-    result = solve_single_day(data, day_label=args.day_label, time_limit_s=args.time_limit)
+    result = solve_single_day(data, day_label=args.day_label, time_limit_s=args.time_limit,
+                              objective=args.objective, fairness_time_limit_s=args.fairness_time_limit,
+                              presolve_only=args.presolve)
 
     # Print compact per-employee summary for the day
     if "by_employee" in result and "fairness_summary" in result:
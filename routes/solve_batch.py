@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+# Nightly batch: plan next week for every shop in the database.
+#
+#   python -m routes.solve batch --demand demand.json [--week-start 2025-09-22]
+#          [--window 21600] [--shop-budget 120] [--concurrency N] [--shops 1,2,3]
+#
+# demand.json holds the /api/solve/week body (without shop_id) per shop, with an optional default:
+#   {"default": {"roles": {"cashier": 1}, "peaks": [...]}, "shops": {"12": {"roles": {...}, "days": [...]}}}
+# Shops come from the shops table (open_time, close_time, open_days); staff, availability and caps
+# are loaded per shop exactly as for POST /api/solve/week, and each week goes through
+# solve_week_payload, so large shops are split into parallel day models automatically.
+#
+# Scheduling: shops with the most staff start first (longest jobs first keeps the tail short),
+# at most `concurrency` shops are in flight and their CP-SAT solves share the process pool
+# (routes/solve_pool.py). Each shop gets min(shop budget, its share of what is left of the
+# window), so the whole fleet finishes inside --window; shops that would start after the
+# window closes are recorded as skipped. One row per run goes to solve_batch_runs and one row
+# per shop (with the full result, for publishing) to solve_batch_shops (tables created by schema.py).
+#
+# Env:
+#   SOLVE_BATCH_WINDOW_S       default --window (default 21600, six hours)
+#   SOLVE_BATCH_SHOP_BUDGET_S  default --shop-budget (default 120)
+
+import argparse
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import List, Optional
+
+from routes.solve import _conn, _load_env
+from routes.solve_week import (
+    _fetch_week_inputs,
+    _parse_week_request,
+    _week_dates,
+    build_week_payload,
+    solve_week_payload,
+)
+
+try:
+    from psycopg.rows import dict_row
+    from psycopg.types.json import Jsonb
+except Exception:
+    dict_row = None
+    Jsonb = None
+
+BATCH_WINDOW_S = int(os.getenv("SOLVE_BATCH_WINDOW_S", "21600") or 0)
+BATCH_SHOP_BUDGET_S = int(os.getenv("SOLVE_BATCH_SHOP_BUDGET_S", "120") or 0)
+
+SQL_SHOPS = """
+    SELECT sh.id, sh.name, count(st.id) AS staff_count
+    FROM shops sh
+    LEFT JOIN staff st ON st.shop_id = sh.id
+    GROUP BY sh.id, sh.name
+    ORDER BY count(st.id) DESC, sh.id;
+"""
+
+SQL_SHOP_RESULT = """
+    INSERT INTO solve_batch_shops
+        (run_id, shop_id, status, strategy, staff_count, time_limit_s, time_s, total_unmet, error, result)
+    VALUES (%(run_id)s, %(shop_id)s, %(status)s, %(strategy)s, %(staff_count)s, %(time_limit_s)s,
+            %(time_s)s, %(total_unmet)s, %(error)s, %(result)s);
+"""
+
+SQL_FINISH_RUN = """
+    UPDATE solve_batch_runs r
+       SET status = 'done',
+           finished_at = now(),
+           shops_solved = s.solved,
+           shops_failed = s.failed,
+           shops_skipped = s.skipped,
+           total_unmet = s.unmet
+      FROM (SELECT count(*) FILTER (WHERE status IN ('OPTIMAL', 'FEASIBLE')) AS solved,
+                   count(*) FILTER (WHERE status NOT IN ('OPTIMAL', 'FEASIBLE', 'skipped')) AS failed,
+                   count(*) FILTER (WHERE status = 'skipped') AS skipped,
+                   coalesce(sum(total_unmet), 0) AS unmet
+              FROM solve_batch_shops WHERE run_id = %(run_id)s) s
+     WHERE r.id = %(run_id)s
+    RETURNING r.shops_total, r.shops_solved, r.shops_failed, r.shops_skipped, r.total_unmet;
+"""
+
+def list_shops(shop_ids: Optional[List[int]] = None) -> List[dict]:
+    """[{id, name, staff_count}], largest shops first."""
+    _load_env()
+    with _conn() as conn, conn.cursor(row_factory=dict_row) as cur:
+        cur.execute(SQL_SHOPS)
+        rows = cur.fetchall() or []
+    if shop_ids:
+        wanted = set(shop_ids)
+        rows = [r for r in rows if r["id"] in wanted]
+    return rows
+
+def shop_request(demand: dict, shop_id: int) -> Optional[dict]:
+    """The /api/solve/week body for a shop from the demand config, or None if it has none."""
+    body = (demand.get("shops") or {}).get(str(shop_id)) or demand.get("default")
+    return dict(body, shop_id=int(shop_id)) if body else None
+
+class _Budget:
+    """Per-shop time limits that keep the whole batch inside its window."""
+
+    def __init__(self, window_s: int, shop_budget_s: int, concurrency: int, n_shops: int):
+        self.deadline = time.monotonic() + window_s
+        self.shop_budget_s = shop_budget_s
+        self.concurrency = concurrency
+        self.pending = n_shops
+        self.lock = threading.Lock()
+
+    def take(self) -> Optional[int]:
+        """Time limit for the next shop, or None when the window has closed."""
+        with self.lock:
+            waves = math.ceil(self.pending / self.concurrency)
+            self.pending -= 1
+            remaining = self.deadline - time.monotonic()
+        if remaining < 1:
+            return None
+        return max(1, min(self.shop_budget_s, int(remaining / max(1, waves))))
+
+def solve_shop(shop: dict, body: Optional[dict], time_limit_s: Optional[int], week_start: str) -> dict:
+    """Plan one shop's week. Returns the solve_batch_shops row (without run_id)."""
+    row = {"shop_id": shop["id"], "staff_count": int(shop["staff_count"]), "strategy": None,
+           "time_limit_s": time_limit_s, "time_s": None, "total_unmet": None, "error": None, "result": None}
+    if time_limit_s is None:
+        return dict(row, status="skipped", error="batch window closed")
+    if body is None:
+        return dict(row, status="skipped", error="no demand configured for this shop")
+
+    t0 = time.perf_counter()
+    try:
+        req, errors = _parse_week_request(dict(body, time_limit=time_limit_s, week_start=week_start))
+        if errors:
+            return dict(row, status="failed", error="; ".join(errors))
+        shop_row, staff_rows = _fetch_week_inputs(req["shop_id"])
+        if shop_row is None:
+            return dict(row, status="failed", error="shop not found")
+        payload = build_week_payload(req, shop_row, staff_rows)
+        if not payload["week"]:
+            return dict(row, status="skipped", error="shop has no open days")
+        if not payload["employees"]:
+            return dict(row, status="skipped", error="shop has no staff")
+        result = solve_week_payload(payload, req)
+        dates = _week_dates(week_start, list(payload["week"]))
+        if dates:
+            result["dates"] = dates
+    except Exception as ex:
+        return dict(row, status="failed", error=str(ex), time_s=round(time.perf_counter() - t0, 3))
+
+    return dict(
+        row,
+        status=result.get("status"),
+        strategy=result.get("strategy"),
+        time_s=round(time.perf_counter() - t0, 3),
+        total_unmet=(result.get("fairness_summary") or {}).get("total_unmet"),
+        result=result,
+    )
+
+def run_batch(demand: dict, week_start: str, window_s: int = BATCH_WINDOW_S,
+              shop_budget_s: int = BATCH_SHOP_BUDGET_S, concurrency: Optional[int] = None,
+              shop_ids: Optional[List[int]] = None) -> dict:
+    """Plan week_start's week for every shop and record the run. Returns the solve_batch_runs row."""
+    from routes.solve_pool import POOL_SIZE
+
+    _load_env()
+    concurrency = max(1, int(concurrency or POOL_SIZE))
+    shops = list_shops(shop_ids)
+    with _conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            "INSERT INTO solve_batch_runs (week_start, window_s, concurrency, shops_total) "
+            "VALUES (%s, %s, %s, %s) RETURNING id",
+            (week_start, window_s, concurrency, len(shops)),
+        )
+        run_id = int(cur.fetchone()[0])
+    print(f"[batch {run_id}] {len(shops)} shops, week {week_start}, window {window_s}s, concurrency {concurrency}")
+
+    budget = _Budget(window_s, shop_budget_s, concurrency, len(shops))
+
+    def one(shop):
+        body = shop_request(demand, shop["id"])
+        row = solve_shop(shop, body, budget.take(), week_start)
+        with _conn() as conn, conn.cursor() as cur:
+            cur.execute(SQL_SHOP_RESULT, dict(row, run_id=run_id,
+                                              result=Jsonb(row["result"]) if row["result"] is not None else None))
+        took = f" in {row['time_s']}s" if row["time_s"] is not None else ""
+        print(f"[batch {run_id}] shop {shop['id']} ({row['staff_count']} staff) -> {row['status']}{took}"
+              + (f": {row['error']}" if row["error"] else ""))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        for _ in ex.map(one, shops):
+            pass
+
+    with _conn() as conn, conn.cursor(row_factory=dict_row) as cur:
+        cur.execute(SQL_FINISH_RUN, {"run_id": run_id})
+        summary = dict(cur.fetchone(), run_id=run_id)
+    print(f"[batch {run_id}] done: {summary['shops_solved']} solved, {summary['shops_failed']} failed,"
+          f" {summary['shops_skipped']} skipped, {summary['total_unmet']} unmet hours")
+    return summary
+
+def _next_monday() -> str:
+    today = date.today()
+    return (today + timedelta(days=7 - today.weekday())).isoformat()
+
+def batch_main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m routes.solve batch")
+    parser.add_argument("--demand", required=True, help="JSON file with the week request per shop (see module header)")
+    parser.add_argument("--week-start", default=None, help="Any day of the week to plan (default: next Monday)")
+    parser.add_argument("--window", type=int, default=BATCH_WINDOW_S, help="Seconds the whole batch may take")
+    parser.add_argument("--shop-budget", type=int, default=BATCH_SHOP_BUDGET_S, help="Solver seconds per shop at most")
+    parser.add_argument("--concurrency", type=int, default=None, help="Shops in flight (default: solver pool size)")
+    parser.add_argument("--shops", default="", help="Comma-separated shop ids (default: all shops)")
+    args = parser.parse_args(argv)
+
+    with open(args.demand, "r", encoding="utf-8") as f:
+        demand = json.load(f)
+    week_start = date.fromisoformat(args.week_start).isoformat() if args.week_start else _next_monday()
+    shop_ids = [int(s) for s in args.shops.split(",") if s.strip()] or None
+    run_batch(demand, week_start, window_s=args.window, shop_budget_s=args.shop_budget,
+              concurrency=args.concurrency, shop_ids=shop_ids)
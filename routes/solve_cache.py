@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+# In-process cache of solve_single_day results keyed by a canonical hash of the problem.
+#
+# The key covers everything the solver actually sees: the day config (times parsed to
+# minutes, peaks sorted), each employee's roles, caps, prev_hours and availability as a
+# per-slot bit-vector, plus the solve options. Equivalent payloads written differently
+# (key order, "9am" vs "09:00", staff order) hash to the same key.
+#
+# The cache lives in each web process; it is a latency shortcut, not shared state.
+#
+# Env:
+#   SOLVE_CACHE_SIZE   max entries (default 256; 0 disables)
+#   SOLVE_CACHE_TTL_S  entry lifetime in seconds (default 900)
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from routes.solve import (
+    availability_slots_for_day,
+    availability_windows_for_label,
+    parse_time_range,
+    parse_time_token,
+)
+
+def _num(v) -> float:
+    try:
+        return round(float(v), 4)
+    except (TypeError, ValueError):
+        return 0.0
+
+def canonical_single_day(payload: dict, day_label: str, slot_size: int = 60) -> dict:
+    """Normalize a solve_single_day payload into a JSON-stable structure."""
+    day = payload["day"]
+    open_m = parse_time_token(day["open"])
+    close_m = parse_time_token(day["close"])
+    peaks = []
+    for p in day.get("peaks") or []:
+        ps, pe = parse_time_range(f'{p["start"]}-{p["end"]}')
+        extra = sorted((str(r), int(x)) for r, x in (p.get("extra") or {}).items())
+        peaks.append([ps, pe, extra])
+    peaks.sort()
+
+    employees = []
+    for e_i, emp in enumerate(payload.get("employees") or []):
+        windows = availability_windows_for_label(emp.get("availability", []), day_label)
+        employees.append({
+            "id": emp.get("id"),
+            "name": emp.get("name", f"emp{e_i}"),
+            "roles": sorted(emp.get("roles") or []),
+            "max_weekly_hours": int(emp.get("max_weekly_hours", 40)),
+            "prev_hours": _num(emp.get("prev_hours", 0)),
+            "avail": "".join(str(b) for b in availability_slots_for_day(windows, open_m, close_m, slot_size)),
+        })
+    employees.sort(key=lambda x: (str(x["id"]), x["name"]))
+
+    return {
+        "day_label": day_label,
+        "open": open_m,
+        "close": close_m,
+        "roles": sorted((str(r), int(n)) for r, n in (day.get("roles") or {}).items()),
+        "peaks": peaks,
+        "employees": employees,
+        "slot_size": int(slot_size),
+    }
+
+def solve_cache_key(payload: dict, day_label: str, **solve_opts) -> str:
+    canon = canonical_single_day(payload, day_label, int(solve_opts.get("slot_size", 60)))
+    canon["opts"] = sorted((k, solve_opts[k]) for k in solve_opts)
+    text = json.dumps(canon, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class SolveCache:
+    """Thread-safe LRU with per-entry TTL and hit/miss counters."""
+
+    def __init__(self, max_size: int = 256, ttl_s: float = 900.0):
+        self.max_size = int(max_size)
+        self.ttl_s = float(ttl_s)
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, value = item
+            if expires_at <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: dict):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_s, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+solve_cache = SolveCache(
+    max_size=int(os.getenv("SOLVE_CACHE_SIZE", "256") or 0),
+    ttl_s=float(os.getenv("SOLVE_CACHE_TTL_S", "900") or 0),
+)
+
+def cached_solve(solve_fn, payload: dict, day_label: str, **solve_opts) -> dict:
+    """Return a cached result for an equivalent problem, else call solve_fn and cache it.
+
+    solve_fn(payload, day_label=..., **solve_opts) must return a JSON-able result dict.
+    The returned dict carries a "cache" entry with the key and whether it was a hit.
+    """
+    key = solve_cache_key(payload, day_label, **solve_opts)
+    hit = solve_cache.get(key)
+    if hit is not None:
+        return dict(hit, cache={"hit": True, "key": key})
+    result = solve_fn(payload, day_label=day_label, **solve_opts)
+    solve_cache.put(key, result)
+    return dict(result, cache={"hit": False, "key": key})
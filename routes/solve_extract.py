@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+# Vectorized post-processing of CP-SAT solutions for routes/solve.py.
+#
+# The solver's response is read once (response_proto.solution holds every variable's
+# value, indexed by var.Index()), the sparse (employee, segment, role) assignment is
+# scattered into a dense bool array X[E, S, R] over slots, and everything the result
+# builders need (per-role blocks, per-employee intervals, slack groups, backups) is
+# computed from that array with numpy instead of per-variable solver.Value() calls.
+#
+# Outputs are identical to merge_shift_blocks_by_role / contiguous_intervals_from_slots /
+# group_slack_intervals in routes/solve.py.
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+def _hhmm(minutes: int) -> str:
+    h = int(minutes) // 60
+    m = int(minutes) % 60
+    return f"{h:02d}:{m:02d}"
+
+def solution_values(solver) -> np.ndarray:
+    """All variable values of the last solve, indexed by variable index."""
+    return np.asarray(solver.ResponseProto().solution, dtype=np.int64)
+
+def var_values(values: np.ndarray, variables: Sequence) -> np.ndarray:
+    """Values of plain IntVar/BoolVar objects (not expressions) from solution_values()."""
+    if not len(variables):
+        return np.zeros(0, dtype=np.int64)
+    return values[np.fromiter((v.Index() for v in variables), dtype=np.int64, count=len(variables))]
+
+def dense_assignment(values: np.ndarray, assign: dict, segments: List[Tuple[int, int]], E: int, R: int) -> np.ndarray:
+    """Scatter the sparse assign[(e, g, r)] solution into a bool array X[E, S, R] over slots."""
+    G = len(segments)
+    X = np.zeros((E, G, R), dtype=bool)
+    if assign:
+        keys = np.array(list(assign.keys()), dtype=np.int64).reshape(-1, 3)
+        on = var_values(values, list(assign.values())) == 1
+        X[keys[on, 0], keys[on, 1], keys[on, 2]] = True
+    seg_len = np.array([b - a for a, b in segments], dtype=np.int64)
+    if not G or np.all(seg_len == 1):
+        return X
+    return np.repeat(X, seg_len, axis=1)
+
+def expand_segments(per_segment: np.ndarray, segments: List[Tuple[int, int]], axis: int = 0) -> np.ndarray:
+    """Repeat per-segment rows (e.g. slack[G, R]) out to slots."""
+    seg_len = np.array([b - a for a, b in segments], dtype=np.int64)
+    return np.repeat(per_segment, seg_len, axis=axis)
+
+def _run_bounds(changes: np.ndarray, S: int) -> List[Tuple[int, int]]:
+    """[start, end) runs of a length-S sequence given bool changes[s] = (item s differs from s-1), s >= 1."""
+    cuts = np.flatnonzero(changes) + 1
+    starts = np.concatenate(([0], cuts))
+    ends = np.concatenate((cuts, [S]))
+    return list(zip(starts.tolist(), ends.tolist()))
+
+def role_blocks(X: np.ndarray, names: List[str], slot_min: int, slot_size: int = 60) -> Dict[int, List[dict]]:
+    """Per role, maximal runs of slots with the same set of employees (empty sets included).
+    Same output as merge_shift_blocks_by_role.
+    """
+    E, S, R = X.shape
+    out = {}
+    if S == 0:
+        return out
+    order = sorted(range(E), key=lambda e: names[e])
+    sorted_names = [names[e] for e in order]
+    Xs = X[order]
+    for r in range(R):
+        col = Xs[:, :, r]
+        changes = np.any(col[:, 1:] != col[:, :-1], axis=0)
+        blocks = []
+        for a, b in _run_bounds(changes, S):
+            emps = np.flatnonzero(col[:, a])
+            blocks.append({
+                "start": _hhmm(slot_min + a * slot_size),
+                "end": _hhmm(slot_min + b * slot_size),
+                "employees": [sorted_names[i] for i in emps.tolist()],
+            })
+        out[r] = blocks
+    return out
+
+def employee_intervals(on: np.ndarray, slot_min: int, slot_size: int = 60) -> Dict[int, List[Tuple[str, str]]]:
+    """{e: [(start, end), ...]} runs of worked slots per employee from on[E, S].
+    Same intervals as contiguous_intervals_from_slots.
+    """
+    E, S = on.shape
+    padded = np.zeros((E, S + 2), dtype=np.int8)
+    padded[:, 1:-1] = on
+    d = np.diff(padded, axis=1)
+    se, ss = np.nonzero(d == 1)
+    _ee, es = np.nonzero(d == -1)
+    out: Dict[int, List[Tuple[str, str]]] = {}
+    # np.nonzero walks row-major, so starts and ends pair up in order
+    for e, a, b in zip(se.tolist(), ss.tolist(), es.tolist()):
+        out.setdefault(e, []).append((_hhmm(slot_min + a * slot_size), _hhmm(slot_min + b * slot_size)))
+    return out
+
+def slack_groups(slack: np.ndarray, slot_min: int, slot_size: int = 60) -> Dict[int, List[dict]]:
+    """Per role, runs of slots with unmet demand and the peak shortfall in each (slack[S, R]).
+    Same groups as group_slack_intervals.
+    """
+    S, R = slack.shape
+    out = {}
+    for r in np.flatnonzero(np.any(slack > 0, axis=0)).tolist():
+        col = slack[:, r]
+        padded = np.concatenate(([0], (col > 0).astype(np.int8), [0]))
+        d = np.diff(padded)
+        groups = []
+        for a, b in zip(np.flatnonzero(d == 1).tolist(), np.flatnonzero(d == -1).tolist()):
+            groups.append({
+                "start": _hhmm(slot_min + a * slot_size),
+                "end": _hhmm(slot_min + b * slot_size),
+                "needed": int(col[a:b].max()),
+            })
+        out[r] = groups
+    return out
+
+class BackupFinder:
+    """Rank qualified, available and unassigned staff for a block.
+
+    Candidates for role r over slots [s0, s1) must be qualified for r, available for every slot
+    and not working any of them; prefix sums make each block an O(E) vector check.
+    Ranking: rank_desc descending, then rank_asc ascending, then name.
+    """
+
+    def __init__(self, can_role: np.ndarray, avail: np.ndarray, on: np.ndarray, names: List[str],
+                 ids: List[Optional[int]], rank_desc: Sequence[float], rank_asc: Sequence[float]):
+        E, S = avail.shape
+        self.can_role = np.asarray(can_role, dtype=bool).reshape(E, -1)
+        self.avail_cum = np.zeros((E, S + 1), dtype=np.int32)
+        self.on_cum = np.zeros((E, S + 1), dtype=np.int32)
+        np.cumsum(avail, axis=1, out=self.avail_cum[:, 1:])
+        np.cumsum(on, axis=1, out=self.on_cum[:, 1:])
+        self.names = names
+        self.ids = ids
+        self.S = S
+        # One fixed ranking for all blocks: sort once, filter per block
+        order = sorted(range(E), key=lambda e: (-rank_desc[e], rank_asc[e], names[e]))
+        self.order = np.array(order, dtype=np.int64)
+
+    def backups(self, r: int, s0: int, s1: int, exclude=(), limit: int = 5) -> List[dict]:
+        if s1 > self.S or s1 <= s0:
+            return []
+        n = s1 - s0
+        ok = self.can_role[:, r] \
+            & (self.avail_cum[:, s1] - self.avail_cum[:, s0] == n) \
+            & (self.on_cum[:, s1] - self.on_cum[:, s0] == 0)
+        out = []
+        skip = set(exclude)
+        for e in self.order[ok[self.order]].tolist():
+            if self.names[e] in skip:
+                continue
+            out.append({"id": self.ids[e], "name": self.names[e]})
+            if len(out) >= limit:
+                break
+        return out
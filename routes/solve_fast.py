@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+# Greedy single-day planner: a sub-second tier in front of CP-SAT (routes/solve.py).
+#
+# Takes the same payload as solve_single_day and returns the same result shape, but
+# fills demand slot by slot instead of searching:
+#   - roles with the fewest eligible staff are filled first in every slot;
+#   - staff already working the role in the previous slot keep it (contiguous blocks),
+#     then whoever has the fewest cumulative hours (prev + today) gets the slot;
+#   - weekly caps and the 7-hour break rule (at most 6 h worked in any 7 h window) are
+#     checked before every pick, so no repair of the result is needed afterwards.
+# There is no optimality claim; unmet demand is reported exactly like the exact solver.
+#
+# Env:
+#   SOLVE_AUTO_FAST_MAX_STAFF  largest shop that mode=auto serves greedily when it covers all demand (default 20)
+
+import os
+import time
+
+import numpy as np
+
+from routes.solve import (
+    availability_slots_for_day,
+    availability_windows_for_label,
+    build_coverage_for_day,
+    hours_to_slots,
+    parse_time_token,
+    slots_to_hours,
+    to_day_blocks_from_role_blocks,
+)
+from routes.solve_extract import BackupFinder, employee_intervals, role_blocks, slack_groups
+
+# mode=auto answers with the greedy plan for shops up to this size when it covers all demand
+AUTO_FAST_MAX_STAFF = int(os.getenv("SOLVE_AUTO_FAST_MAX_STAFF", "20") or 0)
+
+def solve_single_day_fast(data: dict, day_label: str = "day", slot_size: int = 60, backups: bool = True,
+                          **_ignored) -> dict:
+    """Greedy counterpart of solve_single_day (same input and output format).
+    Solver-only options (time limits, hints, objective, ...) are accepted and ignored.
+    """
+    t0 = time.perf_counter()
+    day_cfg = data["day"]
+    employees = data.get("employees", [])
+    if not employees:
+        return {"status": "NO_EMPLOYEES"}
+
+    roles = set(day_cfg.get("roles", {}).keys())
+    for p in day_cfg.get("peaks", []):
+        for r in p.get("extra", {}).keys():
+            roles.add(r)
+    roles = sorted(roles)
+    R = len(roles)
+
+    day_open_m = parse_time_token(day_cfg["open"])
+    day_close_m = parse_time_token(day_cfg["close"])
+    cov, _s0, _s1 = build_coverage_for_day(day_cfg, roles, day_open_m, slot_size)
+    S = len(cov)
+    demand = np.array([[int(cov[s].get(r, 0)) for r in roles] for s in range(S)], dtype=np.int64).reshape(S, R)
+
+    E = len(employees)
+    names = [emp.get("name", f"emp{e}") for e, emp in enumerate(employees)]
+    ids = [emp.get("id") for emp in employees]
+    max_week = [int(emp.get("max_weekly_hours", 40)) for emp in employees]
+    prev_hours = [max(0, int(emp.get("prev_hours", 0))) for emp in employees]
+    avail = np.zeros((E, S), dtype=bool)
+    can = np.ones((E, R), dtype=bool)
+    for e, emp in enumerate(employees):
+        windows = availability_windows_for_label(emp.get("availability", []), day_label)
+        avail[e] = availability_slots_for_day(windows, day_open_m, day_close_m, slot_size)
+        if emp.get("roles"):
+            allowed = set(emp["roles"])
+            can[e] = [r in allowed for r in roles]
+
+    cap = np.array([max(0, hours_to_slots(max_week[e] - prev_hours[e], slot_size)) for e in range(E)], dtype=np.int64)
+    prev_slots = np.array([hours_to_slots(h, slot_size) for h in prev_hours], dtype=np.int64)
+    window = 7 * 60 // slot_size
+    limit = window - 60 // slot_size
+
+    X = np.zeros((E, S, R), dtype=bool)
+    on = np.zeros((E, S), dtype=bool)
+    used = np.zeros(E, dtype=np.int64)
+    unmet = np.zeros((S, R), dtype=np.int64)
+    idx = np.arange(E)
+    for s in range(S):
+        # Worked slots in the window that would end at s, excluding s itself
+        recent = on[:, max(0, s - window + 1):s].sum(axis=1)
+        free = avail[:, s] & (used < cap) & (recent + 1 <= limit)
+        prev_role = X[:, s - 1, :] if s > 0 else np.zeros((E, R), dtype=bool)
+        needed = [r for r in range(R) if demand[s, r] > 0]
+        needed.sort(key=lambda r: int((free & can[:, r]).sum()))
+        for r in needed:
+            eligible = free & can[:, r]
+            cand = idx[eligible]
+            n = int(demand[s, r])
+            if len(cand) > n:
+                # Keep the previous slot's role first, then fewest cumulative slots, then input order
+                keep = ~prev_role[cand, r]
+                cum = prev_slots[cand] + used[cand]
+                cand = cand[np.lexsort((cand, cum, keep))][:n]
+            X[cand, s, r] = True
+            on[cand, s] = True
+            used[cand] += 1
+            free[cand] = False
+            unmet[s, r] = n - len(cand)
+
+    blocks = role_blocks(X, names, day_open_m, slot_size)
+    day_blocks = to_day_blocks_from_role_blocks(blocks)
+    hours_today = [slots_to_hours(int(u), slot_size) for u in used.tolist()]
+    cum_hours = [hours_today[e] + prev_hours[e] for e in range(E)]
+
+    by_role = {}
+    if backups:
+        remaining = [max(0, max_week[e] - prev_hours[e] - hours_today[e]) for e in range(E)]
+        finder = BackupFinder(can, avail, on, names, ids, remaining, cum_hours)
+    for r, rb in blocks.items():
+        if not backups:
+            by_role[roles[r]] = rb
+            continue
+        out_blocks = []
+        for b in rb:
+            s0 = max(0, (parse_time_token(b["start"]) - day_open_m) // slot_size)
+            s1 = max(s0, (parse_time_token(b["end"]) - day_open_m + (slot_size - 1)) // slot_size)
+            out_blocks.append(dict(b, backups=finder.backups(r, s0, s1, exclude=b["employees"])))
+        by_role[roles[r]] = out_blocks
+
+    by_employee = {names[e]: [{"start": a, "end": b} for a, b in ivs]
+                   for e, ivs in sorted(employee_intervals(on, day_open_m, slot_size).items())}
+    unmet_by_role = {roles[r]: g for r, g in slack_groups(unmet, day_open_m, slot_size).items()}
+    cum_slots = prev_slots + used
+
+    return {
+        "status": "FEASIBLE",
+        "day_label": day_label,
+        "schedule": {
+            "days": {day_label: day_blocks},
+            "by_role_assignments": {day_label: by_role},
+        },
+        "by_day": {day_label: {"employees": by_employee}},
+        "by_employee": {name: {day_label: by_employee.get(name, [])} for name in names},
+        "unmet_demand": {day_label: unmet_by_role} if unmet_by_role else {},
+        "fairness_summary": {
+            "min_cum_hours": slots_to_hours(int(cum_slots.min()), slot_size),
+            "max_cum_hours": slots_to_hours(int(cum_slots.max()), slot_size),
+            "emp_hours_today": {names[e]: hours_today[e] for e in range(E)},
+            "prev_hours": {names[e]: int(prev_hours[e]) for e in range(E)},
+            "cum_hours": {names[e]: cum_hours[e] for e in range(E)},
+            "employees_used": int((used > 0).sum()),
+            "total_unmet": slots_to_hours(int(unmet.sum()), slot_size),
+        },
+        "engine_stats": {"elapsed_ms": round((time.perf_counter() - t0) * 1000.0, 2)},
+    }
@@ -0,0 +1,324 @@
+from __future__ import annotations
+
+# Rolling-horizon planner for several weeks at once: POST /api/solve/horizon.
+#
+# One solve_schedule model for 28 days x 150 staff is far too large, but the days of a plan
+# only interact through the weekly hour caps and fairness (caps reset every ISO week). So the
+# horizon is decomposed into one subproblem per day, coordinated per ISO week:
+#   1. Master: the max-flow relaxation (routes/solve_presolve.py) over the week's days splits
+#      each employee's weekly cap into per-day hour budgets that cover the most demand; hours
+#      the flow leaves unused are spread over the employee's other available days, so the
+#      subproblems keep room to balance hours.
+#   2. Subproblems: every day is one solve_single_day with the budgets as caps, the break rule on,
+#      and prev_hours = the employee's hours on the other days of that week in the current plan,
+#      so fairness is balanced across the week. All days run in parallel through the solver pool
+#      (solve_week.solve_day_piece, with the greedy fallback).
+#   3. Price adjustment: days left with unmet demand take budget from qualified staff who are
+#      available that day and left budget unused on other days of the same week. Only days whose
+#      budgets grew are re-solved (hinted with their previous plan). Repeats up to `rounds`
+#      times or until no budget moves.
+# Weekly caps hold by construction: budgets of a week never add up to more than the cap.
+# The result has the solve_schedule shape keyed by date, fairness per week, per-day timings
+# under "windows" and per-round summaries under "rounds".
+
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Dict, List
+
+from routes.solve import (
+    ISO_WEEKDAYS,
+    availability_slots_for_day,
+    build_coverage_for_day,
+    compress_slots,
+    parse_time_token,
+    prior_from_result,
+    _solve_opts,
+)
+from routes.solve_presolve import capacity_bound
+from routes.solve_week import (
+    _fetch_week_inputs,
+    _merge_day_results,
+    _parse_week_request,
+    build_week_payload,
+    pool_waves,
+    solve_day_piece,
+)
+
+try:
+    from flask import Blueprint, request, jsonify
+except Exception:
+    Blueprint = None
+    request = None
+    jsonify = None
+
+MAX_HORIZON_WEEKS = 8
+
+def horizon_from_week(week_payload: dict, start: str, weeks: int = 4) -> dict:
+    """Dated horizon payload repeating a solve_schedule week payload for `weeks` weeks from start."""
+    start_d = date.fromisoformat(start)
+    days = {}
+    for i in range(7 * int(weeks)):
+        d = start_d + timedelta(days=i)
+        weekday = ISO_WEEKDAYS[d.weekday()]
+        if weekday in week_payload["week"]:
+            days[d.isoformat()] = week_payload["week"][weekday]
+    return {"days": days, "employees": week_payload["employees"]}
+
+def _availability_on(emp: dict, date_iso: str) -> list:
+    """Availability windows of emp on a date: a date key wins over the weekday key."""
+    av = emp.get("availability") or []
+    if isinstance(av, dict):
+        return av.get(date_iso) or av.get(ISO_WEEKDAYS[date.fromisoformat(date_iso).weekday()]) or []
+    return av
+
+def _week_of(date_iso: str) -> str:
+    d = date.fromisoformat(date_iso)
+    return (d - timedelta(days=d.weekday())).isoformat()
+
+def _spread(total: int, room: List[int]) -> List[int]:
+    """Split total whole hours over slots with capacity room[i], proportionally (largest remainder)."""
+    cap = sum(room)
+    total = min(total, cap)
+    if total <= 0:
+        return [0] * len(room)
+    shares = [total * r / cap for r in room]
+    whole = [math.floor(x) for x in shares]
+    order = sorted(range(len(room)), key=lambda i: shares[i] - whole[i], reverse=True)
+    for i in order[:total - sum(whole)]:
+        whole[i] += 1
+    return whole
+
+def _hours(result: dict) -> Dict[str, float]:
+    return (result.get("fairness_summary") or {}).get("emp_hours_today") or {}
+
+def plan_horizon(data: dict, time_limit_s: int = 60, slot_size: int = 60, rounds: int = 2, **opts) -> dict:
+    """Plan every day of data["days"] (see module header).
+
+    data: {"days": {"YYYY-MM-DD": {open, close, roles, peaks}}, "employees": [{name, id, roles,
+        max_weekly_hours, prev_hours, availability: {date or weekday: windows}}]}; prev_hours counts
+        hours already worked in the first ISO week before the horizon starts.
+    time_limit_s: wall-clock budget for all rounds together.
+    rounds: price-adjustment rounds after the first solve.
+    opts: solve_single_day options for every day (objective, formulation, backups, ...).
+    """
+    t_start = time.perf_counter()
+    dates = sorted(data.get("days") or {})
+    employees = data.get("employees") or []
+    if not dates:
+        return {"status": "NO_DAYS"}
+    if not employees:
+        return {"status": "NO_EMPLOYEES"}
+    E = len(employees)
+    names = [emp.get("name", f"emp{e}") for e, emp in enumerate(employees)]
+    per_hour = 60 // slot_size
+
+    roles = sorted({r for cfg in data["days"].values() for r in cfg.get("roles", {})}
+                   | {r for cfg in data["days"].values() for p in cfg.get("peaks", []) for r in p.get("extra", {})})
+    can = [[1 if not emp.get("roles") or r in emp["roles"] else 0 for r in roles] for emp in employees]
+    max_week = [int(emp.get("max_weekly_hours", 40)) for emp in employees]
+    prev_first = [max(0, int(emp.get("prev_hours", 0))) for emp in employees]
+
+    # Per-day coverage and availability, as the day models see them
+    day_inputs = {}
+    avail_hours = {}
+    for d in dates:
+        cfg = data["days"][d]
+        open_m, close_m = parse_time_token(cfg["open"]), parse_time_token(cfg["close"])
+        cov = build_coverage_for_day(cfg, roles, open_m, slot_size)[0]
+        av = [availability_slots_for_day(_availability_on(emp, d), open_m, close_m, slot_size) for emp in employees]
+        day_inputs[d] = (cov, av, compress_slots(cov, av, per_hour))
+        avail_hours[d] = [sum(a) // per_hour for a in av]
+    weeks: Dict[str, List[str]] = {}
+    for d in dates:
+        weeks.setdefault(_week_of(d), []).append(d)
+    first_week = min(weeks)
+
+    # 1. Master: per-day hour budgets from the week's max-flow, plus the spare hours spread by availability
+    budget: Dict[str, List[int]] = {}
+    week_cap: Dict[str, List[int]] = {}
+    for w, wdays in weeks.items():
+        caps = [max(0, max_week[e] - (prev_first[e] if w == first_week else 0)) for e in range(E)]
+        week_cap[w] = caps
+        flow = capacity_bound([day_inputs[d] for d in wdays], roles, can, [c * per_hour for c in caps],
+                              employee_days=True)["employee_day_slots"]
+        for d in wdays:
+            budget[d] = [0] * E
+        for e in range(E):
+            base = [flow[i][e] // per_hour for i in range(len(wdays))]
+            room = [max(0, avail_hours[d][e] - base[i]) for i, d in enumerate(wdays)]
+            extra = _spread(caps[e] - sum(base), room)
+            for i, d in enumerate(wdays):
+                budget[d][e] = base[i] + extra[i]
+
+    results: Dict[str, dict] = {}
+    windows: Dict[str, dict] = {d: {"week": _week_of(d), "solves": []} for d in dates}
+    round_log = []
+
+    def prev_hours_for(d: str) -> List[int]:
+        # Hours on the week's other days in the current plan (budgets before the first solve)
+        w = _week_of(d)
+        out = []
+        for e in range(E):
+            other = sum(int(_hours(results[x]).get(names[e], 0)) if x in results else budget[x][e]
+                        for x in weeks[w] if x != d)
+            out.append(other + (prev_first[e] if w == first_week else 0))
+        return out
+
+    def solve_days(todo: List[str], limit: int):
+        from routes.solve_pool import POOL_SIZE
+
+        def one(d):
+            prev = prev_hours_for(d)
+            day_payload = {
+                "day": data["days"][d],
+                "employees": [dict(emp, availability=_availability_on(emp, d), prev_hours=prev[e],
+                                   max_weekly_hours=prev[e] + budget[d][e])
+                              for e, emp in enumerate(employees)],
+            }
+            hint = prior_from_result(results[d], d) if d in results else None
+            return solve_day_piece(day_payload, d, limit, slot_size, **dict(opts, hint=hint) if hint else opts)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(len(todo), POOL_SIZE))) as ex:
+            for d, (res, secs) in zip(todo, ex.map(one, todo)):
+                results[d] = res
+                windows[d]["solves"].append({
+                    "round": len(round_log), "status": res.get("status"), "engine": res.get("engine"),
+                    "time_s": secs, "time_limit_s": limit,
+                    "total_unmet": (res.get("fairness_summary") or {}).get("total_unmet"),
+                })
+
+    todo = list(dates)
+    for rnd in range(int(rounds) + 1):
+        t0 = time.perf_counter()
+        remaining = time_limit_s - (t0 - t_start)
+        if rnd and remaining < 1:
+            break
+        # Share what is left of the budget between this round and the ones after it
+        limit = max(1, int(remaining / (int(rounds) + 1 - rnd)) // pool_waves(len(todo)))
+        solve_days(todo, limit)
+        moved = _adjust_budgets(weeks, budget, results, day_inputs, avail_hours, can, roles, names) \
+            if rnd < int(rounds) else {}
+        round_log.append({
+            "round": rnd,
+            "days_solved": len(todo),
+            "time_s": round(time.perf_counter() - t0, 3),
+            "total_unmet": sum((results[d].get("fairness_summary") or {}).get("total_unmet", 0) for d in dates),
+            "hours_moved": sum(moved.values()),
+        })
+        todo = sorted(moved)
+        if not todo:
+            break
+
+    out = _merge_day_results({d: results[d] for d in dates}, employees)
+    out["fairness_summary"] = {
+        "weeks": {},
+        "employees_used": out["fairness_summary"]["employees_used"],
+        "total_unmet": out["fairness_summary"]["total_unmet"],
+    }
+    for w, wdays in weeks.items():
+        hours = {n: sum(_hours(results[d]).get(n, 0) for d in wdays) for n in names}
+        out["fairness_summary"]["weeks"][w] = {
+            "min_hours": min(hours.values()),
+            "max_hours": max(hours.values()),
+            "emp_hours": hours,
+        }
+    out["windows"] = windows
+    out["rounds"] = round_log
+    out["time_s"] = round(time.perf_counter() - t_start, 3)
+    return out
+
+def _adjust_budgets(weeks, budget, results, day_inputs, avail_hours, can, roles, names) -> Dict[str, int]:
+    """Move unused budget hours to days with unmet demand (same employee, same week).
+    Returns {date: hours gained} for the days that must be re-solved.
+    """
+    gained: Dict[str, int] = {}
+    for wdays in weeks.values():
+        used = {d: [int(math.ceil(_hours(results[d]).get(n, 0))) for n in names] for d in wdays}
+        for d in wdays:
+            need = int(math.ceil((results[d].get("fairness_summary") or {}).get("total_unmet", 0)))
+            if need <= 0:
+                continue
+            unmet_roles = {roles.index(r) for r in (results[d].get("unmet_demand") or {}).get(d, {}) if r in roles}
+            for e, name in enumerate(names):
+                if need <= 0:
+                    break
+                # Only staff the day could use more of: qualified for a short role and with free hours
+                if not any(can[e][r] for r in unmet_roles):
+                    continue
+                room = avail_hours[d][e] - max(budget[d][e], used[d][e])
+                if room <= 0 or used[d][e] < budget[d][e]:
+                    continue
+                for donor in wdays:
+                    spare = budget[donor][e] - used[donor][e]
+                    if donor == d or spare <= 0:
+                        continue
+                    take = min(spare, room, need)
+                    budget[donor][e] -= take
+                    budget[d][e] += take
+                    gained[d] = gained.get(d, 0) + take
+                    room -= take
+                    need -= take
+                    if need <= 0 or room <= 0:
+                        break
+    return gained
+
+# ---------- Flask routes ----------
+
+if Blueprint is not None:
+    solve_horizon_bp = Blueprint("solve_horizon_bp", __name__, url_prefix="/api")
+
+    @solve_horizon_bp.post("/solve/horizon")
+    def solve_horizon_endpoint():
+        """
+        POST /api/solve/horizon
+        Same body as POST /api/solve/week, plus:
+          - start: "YYYY-MM-DD" first day of the horizon (required)
+          - weeks: number of weeks to plan (default 4, at most 8)
+          - rounds: price-adjustment rounds between the day subproblems (default 2)
+          - time_limit: budget for the whole horizon in seconds (default 60)
+        The result is keyed by date and adds "windows" (per-day solves and timings) and "rounds".
+        """
+        if not request.is_json:
+            return jsonify({"error": "Content-Type must be application/json"}), 415
+
+        body = request.get_json(silent=True) or {}
+        req, errors = _parse_week_request(dict(body, time_limit=body.get("time_limit", 60)), request.args)
+        errors = list(errors)
+        start = body.get("start")
+        weeks = body.get("weeks", 4)
+        rounds = body.get("rounds", 2)
+        try:
+            date.fromisoformat(str(start))
+        except ValueError:
+            errors.append("start must be YYYY-MM-DD")
+        if not isinstance(weeks, int) or not 1 <= weeks <= MAX_HORIZON_WEEKS:
+            errors.append(f"weeks must be an int between 1 and {MAX_HORIZON_WEEKS}")
+        if not isinstance(rounds, int) or rounds < 0:
+            errors.append("rounds must be a non-negative int")
+        if errors:
+            return jsonify({"error": "validation_failed", "details": errors}), 400
+
+        try:
+            shop, staff_rows = _fetch_week_inputs(req["shop_id"])
+        except Exception as ex:
+            return jsonify({"error": "db_error", "detail": str(ex)}), 500
+        if shop is None:
+            return jsonify({"error": "shop_not_found"}), 404
+        try:
+            horizon = horizon_from_week(build_week_payload(req, shop, staff_rows), start, weeks)
+        except ValueError as ex:
+            return jsonify({"error": "validation_failed", "details": [str(ex)]}), 400
+
+        opts = _solve_opts(req)
+        opts.pop("time_limit_s")
+        opts.pop("slot_size", None)
+        try:
+            result = plan_horizon(horizon, time_limit_s=req["time_limit"], slot_size=req["slot_size"],
+                                  rounds=rounds, **opts)
+        except Exception as ex:
+            return jsonify({"error": "Failed to compute schedule", "detail": str(ex)}), 500
+        return jsonify(result), 200
+else:
+    solve_horizon_bp = None
@@ -0,0 +1,306 @@
+from __future__ import annotations
+
+# Durable async solve jobs backed by Postgres.
+#
+# Web tier:  POST /api/solve/jobs               -> {"job_id": ...}   (202)
+#            GET  /api/solve/jobs/<id>          -> status / result
+#            POST /api/solve/jobs/<id>/cancel
+# Worker:    python -m routes.solve worker [--poll 1.0] [--once]
+#
+# Workers claim queued jobs with FOR UPDATE SKIP LOCKED, so any number of worker
+# processes can run against the same table without double-solving a job.
+# The solve_jobs table is created by schema.py (python schema.py).
+
+import argparse
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from typing import List, Optional
+
+from routes.solve import _conn, _load_env, _parse_solve_request, run_solve_request
+
+try:
+    from flask import Blueprint, request, jsonify
+except Exception:
+    Blueprint = None
+    request = None
+    jsonify = None
+
+try:
+    from psycopg.rows import dict_row
+    from psycopg.types.json import Jsonb
+except Exception:
+    dict_row = None
+    Jsonb = None
+
+# A running job whose heartbeat is older than this is considered orphaned (worker died)
+LEASE_SECONDS = int(os.getenv("SOLVE_JOB_LEASE_S", "60"))
+HEARTBEAT_SECONDS = max(1, LEASE_SECONDS // 4)
+MAX_ATTEMPTS = int(os.getenv("SOLVE_JOB_MAX_ATTEMPTS", "3"))
+
+log = logging.getLogger(__name__)
+
+SQL_CLAIM = """
+    UPDATE solve_jobs j
+       SET status = 'running',
+           worker_id = %(worker_id)s,
+           attempts = j.attempts + 1,
+           started_at = now(),
+           heartbeat_at = now()
+     WHERE j.id = (
+        SELECT id FROM solve_jobs
+         WHERE (status = 'queued' AND NOT cancel_requested)
+            OR (status = 'running'
+                AND NOT cancel_requested
+                AND heartbeat_at < now() - make_interval(secs => %(lease)s)
+                AND attempts < %(max_attempts)s)
+         ORDER BY id
+         FOR UPDATE SKIP LOCKED
+         LIMIT 1
+     )
+    RETURNING j.id, j.request, j.attempts;
+"""
+
+# Orphaned jobs that already used up their attempts are failed instead of re-claimed
+SQL_FAIL_EXHAUSTED = """
+    UPDATE solve_jobs
+       SET status = 'failed', error = 'worker lost (max attempts reached)', finished_at = now()
+     WHERE status = 'running'
+       AND NOT cancel_requested
+       AND heartbeat_at < now() - make_interval(secs => %(lease)s)
+       AND attempts >= %(max_attempts)s;
+"""
+
+# Orphaned jobs that were asked to cancel are finalized as cancelled, never re-run
+SQL_CANCEL_ORPHANED = """
+    UPDATE solve_jobs
+       SET status = 'cancelled', finished_at = now()
+     WHERE status = 'running'
+       AND cancel_requested
+       AND heartbeat_at < now() - make_interval(secs => %(lease)s);
+"""
+
+# A cancel request on a running job takes effect here: the job is finalized as cancelled
+SQL_HEARTBEAT = """
+    UPDATE solve_jobs
+       SET heartbeat_at = now(),
+           status = CASE WHEN cancel_requested THEN 'cancelled' ELSE status END,
+           finished_at = CASE WHEN cancel_requested THEN now() ELSE finished_at END
+     WHERE id = %s AND worker_id = %s AND status = 'running'
+    RETURNING status;
+"""
+
+SQL_FINISH = """
+    UPDATE solve_jobs
+       SET status = CASE WHEN cancel_requested THEN 'cancelled' ELSE %(status)s END,
+           result = CASE WHEN cancel_requested THEN NULL ELSE %(result)s::jsonb END,
+           error = %(error)s,
+           finished_at = now()
+     WHERE id = %(id)s AND worker_id = %(worker_id)s AND status = 'running'
+    RETURNING status;
+"""
+
+def submit_job(req: dict) -> int:
+    _load_env()
+    with _conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            "INSERT INTO solve_jobs (shop_id, request) VALUES (%s, %s) RETURNING id",
+            (req["shop_id"], Jsonb(req)),
+        )
+        return int(cur.fetchone()[0])
+
+def get_job(job_id: int) -> Optional[dict]:
+    _load_env()
+    with _conn() as conn, conn.cursor(row_factory=dict_row) as cur:
+        cur.execute(
+            """
+            SELECT id, shop_id, status, result, error, attempts, cancel_requested,
+                   created_at, started_at, finished_at
+            FROM solve_jobs WHERE id = %s
+            """,
+            (job_id,),
+        )
+        return cur.fetchone()
+
+def cancel_job(job_id: int) -> Optional[str]:
+    """Cancel a queued job immediately, or flag a running one. Returns the resulting status.
+
+    A flagged running job turns "cancelled" at its worker's next heartbeat (HEARTBEAT_SECONDS).
+    Its CP-SAT solve cannot be interrupted inside the pool process: it runs to its time limit and
+    the result is discarded.
+    """
+    _load_env()
+    with _conn() as conn, conn.cursor(row_factory=dict_row) as cur:
+        cur.execute("SELECT status FROM solve_jobs WHERE id = %s FOR UPDATE", (job_id,))
+        row = cur.fetchone()
+        if not row:
+            return None
+        if row["status"] == "queued":
+            cur.execute(
+                "UPDATE solve_jobs SET status = 'cancelled', cancel_requested = true, finished_at = now() WHERE id = %s",
+                (job_id,),
+            )
+            return "cancelled"
+        if row["status"] == "running":
+            cur.execute("UPDATE solve_jobs SET cancel_requested = true WHERE id = %s", (job_id,))
+            return "cancelling"
+        return row["status"]
+
+def _iso(ts) -> Optional[str]:
+    return ts.isoformat() if ts is not None else None
+
+# ---------- Worker ----------
+
+def _claim(worker_id: str) -> Optional[dict]:
+    params = {"worker_id": worker_id, "lease": LEASE_SECONDS, "max_attempts": MAX_ATTEMPTS}
+    with _conn() as conn, conn.cursor(row_factory=dict_row) as cur:
+        cur.execute(SQL_CANCEL_ORPHANED, params)
+        cur.execute(SQL_FAIL_EXHAUSTED, params)
+        cur.execute(SQL_CLAIM, params)
+        return cur.fetchone()
+
+def _heartbeat_loop(job_id: int, worker_id: str, stop: threading.Event):
+    while not stop.wait(HEARTBEAT_SECONDS):
+        try:
+            with _conn() as conn, conn.cursor() as cur:
+                cur.execute(SQL_HEARTBEAT, (job_id, worker_id))
+                row = cur.fetchone()
+        except Exception as ex:
+            log.warning("[worker %s] heartbeat failed for job %s: %s", worker_id, job_id, ex)
+            continue
+        if row and row[0] == "cancelled":
+            log.info("[worker %s] job %s cancelled; its result will be discarded", worker_id, job_id)
+            return
+
+def _finish(job_id: int, worker_id: str, status: str, result: Optional[dict], error: Optional[str]) -> Optional[str]:
+    with _conn() as conn, conn.cursor() as cur:
+        cur.execute(SQL_FINISH, {
+            "id": job_id,
+            "worker_id": worker_id,
+            "status": status,
+            "result": Jsonb(result) if result is not None else None,
+            "error": error,
+        })
+        row = cur.fetchone()
+        return row[0] if row else None
+
+def run_one(worker_id: str) -> bool:
+    """Claim and run a single job. Returns False when the queue was empty."""
+    job = _claim(worker_id)
+    if not job:
+        return False
+    job_id = int(job["id"])
+    log.info("[worker %s] job %s claimed (attempt %s)", worker_id, job_id, job["attempts"])
+
+    stop = threading.Event()
+    hb = threading.Thread(target=_heartbeat_loop, args=(job_id, worker_id, stop), daemon=True)
+    hb.start()
+    t0 = time.perf_counter()
+    try:
+        result = run_solve_request(job["request"])
+        final = _finish(job_id, worker_id, "done", result, None)
+    except Exception as ex:
+        final = _finish(job_id, worker_id, "failed", None, str(ex))
+    finally:
+        stop.set()
+        hb.join()
+    # final is None when the job stopped being ours meanwhile (cancelled, or its lease was lost)
+    log.info("[worker %s] job %s -> %s in %.2fs", worker_id, job_id, final or "discarded", time.perf_counter() - t0)
+    return True
+
+def worker_main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m routes.solve worker")
+    parser.add_argument("--poll", type=float, default=1.0, help="Seconds to sleep when the queue is empty")
+    parser.add_argument("--once", action="store_true", help="Drain the queue once and exit")
+    args = parser.parse_args(argv)
+
+    # Worker output goes through logging; the CLI shows INFO and up unless logging is configured
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    _load_env()
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    stopping = threading.Event()
+
+    def _stop(signum, frame):
+        # Finish the current job, then exit
+        stopping.set()
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    log.info("[worker %s] started (lease %ss, max attempts %s)", worker_id, LEASE_SECONDS, MAX_ATTEMPTS)
+
+    while not stopping.is_set():
+        try:
+            worked = run_one(worker_id)
+        except Exception as ex:
+            log.error("[worker %s] claim failed: %s", worker_id, ex)
+            worked = False
+        if not worked:
+            if args.once:
+                break
+            stopping.wait(args.poll)
+    log.info("[worker %s] stopped", worker_id)
+
+# ---------- Flask routes ----------
+
+if Blueprint is not None:
+    solve_jobs_bp = Blueprint("solve_jobs_bp", __name__, url_prefix="/api")
+
+    @solve_jobs_bp.post("/solve/jobs")
+    def submit_solve_job():
+        """
+        POST /api/solve/jobs
+        Same body as POST /api/solve. Returns 202 with a job id; poll GET /api/solve/jobs/<id>.
+        """
+        if not request.is_json:
+            return jsonify({"error": "Content-Type must be application/json"}), 415
+
+        body = request.get_json(silent=True) or {}
+        req, errors = _parse_solve_request(body, request.args)
+        if errors:
+            return jsonify({"error": "validation_failed", "details": errors}), 400
+
+        try:
+            job_id = submit_job(req)
+        except Exception as ex:
+            return jsonify({"error": "db_error", "detail": str(ex)}), 500
+
+        return jsonify({"job_id": job_id, "status": "queued", "poll": f"/api/solve/jobs/{job_id}"}), 202
+
+    @solve_jobs_bp.get("/solve/jobs/<int:job_id>")
+    def get_solve_job(job_id: int):
+        try:
+            job = get_job(job_id)
+        except Exception as ex:
+            return jsonify({"error": "db_error", "detail": str(ex)}), 500
+        if not job:
+            return jsonify({"error": "job_not_found"}), 404
+
+        return jsonify({
+            "job_id": job["id"],
+            "shop_id": job["shop_id"],
+            "status": job["status"],
+            "attempts": job["attempts"],
+            "cancel_requested": job["cancel_requested"],
+            "created_at": _iso(job["created_at"]),
+            "started_at": _iso(job["started_at"]),
+            "finished_at": _iso(job["finished_at"]),
+            "error": job["error"],
+            "result": job["result"],
+        })
+
+    @solve_jobs_bp.post("/solve/jobs/<int:job_id>/cancel")
+    def cancel_solve_job(job_id: int):
+        try:
+            status = cancel_job(job_id)
+        except Exception as ex:
+            return jsonify({"error": "db_error", "detail": str(ex)}), 500
+        if status is None:
+            return jsonify({"error": "job_not_found"}), 404
+        if status not in ("cancelled", "cancelling"):
+            return jsonify({"error": "job_already_finished", "status": status}), 409
+        return jsonify({"job_id": job_id, "status": status})
+else:
+    solve_jobs_bp = None
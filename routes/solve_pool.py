@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+# Shared CP-SAT process pool for solve_single_day / solve_schedule.
+#
+# - One pool per web process, created lazily (and re-created after a fork).
+# - Workers are spawned (not forked) and import ortools once in the initializer.
+# - The CPU quota of the container (cgroup v2/v1, else affinity) is split between
+#   the solves in flight when a solve starts (this process's count times the web
+#   workers), so a lone solve gets the whole quota and 4 concurrent ones on 8 cores
+#   get 2 search threads each - but never fewer than SOLVE_MIN_SEARCH_WORKERS, which
+#   keeps CP-SAT's parallel portfolio and LNS workers.
+# - Each worker gets an address-space rlimit and CP-SAT gets max_memory_in_mb, so a
+#   huge model fails inside the pool instead of OOM-killing a web worker.
+# - stream_in_pool relays each improving solution back through a manager queue
+#   while the solve runs (anytime mode for /api/solve/stream).
+#
+# Env:
+#   SOLVE_POOL_SIZE       concurrent solves per web process (default: cpus // web workers, >= 1)
+#   SOLVE_MIN_SEARCH_WORKERS  CP-SAT search workers per solve at least (default 4, at most the quota)
+#   SOLVE_MAX_MEMORY_MB   per-solve memory cap (default 2048; 0 disables)
+#   SOLVE_POOL            set to 0 to solve inline (no subprocesses), e.g. for local debugging
+#   WEB_CONCURRENCY       gunicorn worker count, used to divide the CPU quota
+
+import math
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator, Optional, Tuple
+
+try:
+    import resource
+except Exception:  # not available on Windows
+    resource = None
+
+def _read_int_file(path: str) -> Optional[int]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return int(f.read().strip())
+    except Exception:
+        return None
+
+def cpu_quota() -> int:
+    """Number of CPUs this container may use (cgroup quota, else CPU affinity, else cpu_count)."""
+    # cgroup v2: "max 100000" or "<quota> <period>"
+    try:
+        with open("/sys/fs/cgroup/cpu.max", "r", encoding="utf-8") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max" and int(period) > 0:
+            return max(1, math.floor(int(quota) / int(period)))
+    except Exception:
+        pass
+    # cgroup v1
+    quota = _read_int_file("/sys/fs/cgroup/cpu/cpu.cfs_quota_us")
+    period = _read_int_file("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+    if quota and period and quota > 0 and period > 0:
+        return max(1, math.floor(quota / period))
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except Exception:
+        return max(1, os.cpu_count() or 1)
+
+def _web_workers() -> int:
+    try:
+        return max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+    except ValueError:
+        return 1
+
+CPUS = cpu_quota()
+POOL_SIZE = max(1, int(os.getenv("SOLVE_POOL_SIZE", "0") or 0) or CPUS // _web_workers())
+MAX_MEMORY_MB = int(os.getenv("SOLVE_MAX_MEMORY_MB", "2048") or 0)
+POOL_ENABLED = os.getenv("SOLVE_POOL", "1") != "0"
+MIN_SEARCH_WORKERS = max(1, min(CPUS, int(os.getenv("SOLVE_MIN_SEARCH_WORKERS", "4") or 1)))
+
+def search_workers_per_solve(in_flight: int = 1) -> int:
+    """CP-SAT search workers for a solve starting while in_flight solves (itself included) run in
+    this process: its share of the CPU quota, at least MIN_SEARCH_WORKERS."""
+    return max(MIN_SEARCH_WORKERS, CPUS // (max(1, in_flight) * _web_workers()))
+
+def _start_solve() -> int:
+    global _active
+    with _active_lock:
+        _active += 1
+        return _active
+
+def _end_solve():
+    global _active
+    with _active_lock:
+        _active -= 1
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_pid: Optional[int] = None
+_pool_lock = threading.Lock()
+_active = 0
+_active_lock = threading.Lock()
+_manager = None
+_manager_pid: Optional[int] = None
+
+def _init_worker(max_memory_mb: int):
+    # Address-space cap: CP-SAT reserves virtual memory per thread, so leave 2x headroom
+    # over the solver's own max_memory_in_mb before the kernel refuses allocations.
+    if resource is not None and max_memory_mb > 0:
+        limit = int(max_memory_mb) * 2 * 1024 * 1024
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ValueError, OSError):
+            pass
+    # Import ortools (and the model builders) once per worker process
+    import routes.solve  # noqa: F401
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool, _pool_pid
+    with _pool_lock:
+        # A pool inherited through fork (gunicorn preload) is unusable; build a fresh one
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(
+                max_workers=POOL_SIZE,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(MAX_MEMORY_MB,),
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def _run(kind: str, payload: dict, kwargs: dict) -> dict:
+    from routes.solve import solve_single_day, solve_schedule
+    if kind == "single_day":
+        return solve_single_day(payload, **kwargs)
+    if kind == "week":
+        return solve_schedule(payload, **kwargs)
+    raise ValueError(f"unknown solve kind: {kind}")
+
+def _run_streaming(kind: str, payload: dict, kwargs: dict, events) -> dict:
+    # events is a queue proxy from _get_manager(); every improving solution is put on it
+    return _run(kind, payload, dict(kwargs, on_solution=events.put))
+
+def _get_manager():
+    """One multiprocessing manager per web process; its queues cross into the spawned workers."""
+    global _manager, _manager_pid
+    with _pool_lock:
+        if _manager is None or _manager_pid != os.getpid():
+            _manager = multiprocessing.get_context("spawn").Manager()
+            _manager_pid = os.getpid()
+        return _manager
+
+def active_solves() -> int:
+    """Solves currently submitted to (or running in) this process's pool."""
+    return _active
+
+def solve_in_pool(kind: str, payload: dict, **kwargs) -> dict:
+    """Run solve_single_day ("single_day") or solve_schedule ("week") in the shared pool.
+
+    num_workers defaults to this solve's share of the CPU quota given the solves in flight (see
+    search_workers_per_solve) and max_memory_mb to SOLVE_MAX_MEMORY_MB; pass them to override.
+    """
+    kwargs.setdefault("max_memory_mb", MAX_MEMORY_MB)
+    if not POOL_ENABLED:
+        kwargs.setdefault("num_workers", search_workers_per_solve())
+        return _run(kind, payload, kwargs)
+
+    kwargs.setdefault("num_workers", search_workers_per_solve(_start_solve()))
+    try:
+        return _get_pool().submit(_run, kind, payload, kwargs).result()
+    except BrokenProcessPool:
+        # A worker died (usually the memory cap); drop the pool so the next solve gets a fresh one
+        _reset_pool()
+        raise RuntimeError("solver process crashed (model too large for SOLVE_MAX_MEMORY_MB?)")
+    finally:
+        _end_solve()
+
+def stream_in_pool(kind: str, payload: dict, **kwargs) -> Iterator[Tuple[str, dict]]:
+    """Like solve_in_pool, but yields ("solution", event) for every improving solution as the
+    solver finds it (see on_solution in solve_single_day), then ("result", result).
+    Only "single_day" supports on_solution.
+    """
+    kwargs.setdefault("max_memory_mb", MAX_MEMORY_MB)
+    # Inline mode solves in a thread of this process so events can still be yielded meanwhile
+    executor = None if POOL_ENABLED else ThreadPoolExecutor(max_workers=1)
+    events = _get_manager().Queue() if POOL_ENABLED else queue.Queue()
+
+    kwargs.setdefault("num_workers", search_workers_per_solve(_start_solve()))
+    try:
+        future = (executor or _get_pool()).submit(_run_streaming, kind, payload, kwargs, events)
+        # None after the last event marks the end of the solve (also when the worker crashed)
+        future.add_done_callback(lambda _f: events.put(None))
+        for event in iter(events.get, None):
+            yield "solution", event
+        try:
+            result = future.result()
+        except BrokenProcessPool:
+            _reset_pool()
+            raise RuntimeError("solver process crashed (model too large for SOLVE_MAX_MEMORY_MB?)")
+        yield "result", result
+    finally:
+        _end_solve()
+        if executor is not None:
+            executor.shutdown(wait=False)
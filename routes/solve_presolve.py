@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+# Pre-solve capacity bounds for routes/solve.py.
+#
+# Before CP-SAT runs, the coverage problem is relaxed to a max-flow, dropping the break
+# rule and the contiguity of shifts:
+#
+#   source -> (day, segment, role)      capacity demand * segment length
+#          -> (day, segment, employee)  if qualified and available; capacity segment length
+#          -> employee                  capacity segment length
+#          -> sink                      capacity hours cap (in slots)
+#
+# Every real schedule is a flow in this network, so demand - max flow is a lower bound on
+# unmet demand. The solvers add "total slack >= bound" as a redundant constraint, so CP-SAT
+# proves optimality as soon as a solution reaches the bound instead of running out the
+# time limit. Without a break rule the bound is exact only when every segment is a single
+# slot; otherwise it is still a valid lower bound on unmet demand, but not necessarily tight.
+#
+# The per-role shortfalls (demand above the qualified and available headcount of a slot)
+# are reported in the same {role: [{start, end, needed}]} shape as unmet_demand.
+
+import time
+from typing import List, Sequence, Tuple
+
+import numpy as np
+from ortools.graph.python import max_flow
+
+from routes.solve_extract import slack_groups
+
+def capacity_bound(days: Sequence[Tuple[List[dict], List[List[int]], List[Tuple[int, int]]]],
+                   roles: List[str], emp_can_role: List[List[int]], cap_slots: Sequence[int],
+                   employee_days: bool = False) -> dict:
+    """Max-flow bound over one or more days.
+
+    days: [(cov, emp_avail, segments)] per day, as used by the model builders (cov[s] is
+        {role: demand}, emp_avail[e][s] is 0/1, segments from compress_slots).
+    cap_slots: hours cap per employee in slots, shared by all days.
+    Returns demand, max_coverable and lower_bound_unmet (all in slots). With employee_days, also
+    "employee_day_slots" [day][e]: the slots of employee e the flow routes to each day, i.e. one
+    split of the shared caps across days that achieves max_coverable.
+    """
+    E = len(cap_slots)
+    R = len(roles)
+    can = np.asarray(emp_can_role, dtype=bool).reshape(E, R)
+    tails, heads, caps = [], [], []
+    node = 2 + E  # 0 source, 1 sink, 2..E+1 employees
+    demand_total = 0
+    n_arcs = 0
+    day_arcs = []  # (day, first arc, employee per arc) of the (segment, employee) -> employee arcs
+    for d, (cov, emp_avail, segments) in enumerate(days):
+        if not segments:
+            continue
+        G = len(segments)
+        seg_len = np.array([b - a for a, b in segments], dtype=np.int64)
+        starts = [a for a, _b in segments]
+        need = np.array([[int(cov[a].get(r, 0)) for r in roles] for a in starts], dtype=np.int64).reshape(G, R)
+        avail = np.asarray(emp_avail, dtype=bool).reshape(E, -1)[:, starts] if E else np.zeros((0, G), dtype=bool)
+        demand_total += int((need * seg_len[:, None]).sum())
+
+        role_node = node + np.arange(G * R).reshape(G, R)
+        emp_node = node + G * R + np.arange(G * E).reshape(G, E)
+        node += G * R + G * E
+
+        # source -> (segment, role)
+        g_idx, r_idx = np.nonzero(need > 0)
+        tails.append(np.zeros(len(g_idx), dtype=np.int64))
+        heads.append(role_node[g_idx, r_idx])
+        caps.append(need[g_idx, r_idx] * seg_len[g_idx])
+        n_arcs += len(g_idx)
+        # (segment, role) -> (segment, employee)
+        ok = (need > 0)[:, :, None] & can.T[None, :, :] & avail.T[:, None, :]
+        g_idx, r_idx, e_idx = np.nonzero(ok)
+        tails.append(role_node[g_idx, r_idx])
+        heads.append(emp_node[g_idx, e_idx])
+        caps.append(seg_len[g_idx])
+        n_arcs += len(g_idx)
+        # (segment, employee) -> employee
+        g_idx, e_idx = np.nonzero(avail.T & (ok.any(axis=1)))
+        tails.append(emp_node[g_idx, e_idx])
+        heads.append(2 + e_idx)
+        caps.append(seg_len[g_idx])
+        day_arcs.append((d, n_arcs, e_idx))
+        n_arcs += len(g_idx)
+    # employee -> sink
+    tails.append(2 + np.arange(E, dtype=np.int64))
+    heads.append(np.ones(E, dtype=np.int64))
+    caps.append(np.maximum(0, np.asarray(cap_slots, dtype=np.int64)))
+
+    flow = max_flow.SimpleMaxFlow()
+    arcs = flow.add_arcs_with_capacity(np.concatenate(tails), np.concatenate(heads), np.concatenate(caps))
+    solved = flow.solve(0, 1) == flow.OPTIMAL
+    covered = flow.optimal_flow() if solved else 0
+    out = {
+        "demand": demand_total,
+        "max_coverable": int(covered),
+        "lower_bound_unmet": int(demand_total - covered),
+    }
+    if employee_days:
+        per_day = np.zeros((len(days), E), dtype=np.int64)
+        if solved:
+            for d, first, e_idx in day_arcs:
+                np.add.at(per_day[d], e_idx, flow.flows(arcs[first:first + len(e_idx)]))
+        out["employee_day_slots"] = per_day.tolist()
+    return out
+
+def role_shortfalls(cov: List[dict], roles: List[str], emp_avail: List[List[int]], emp_can_role: List[List[int]],
+                    slot_min: int, slot_size: int = 60) -> dict:
+    """{role: [{start, end, needed}]} where a slot's demand exceeds its qualified, available staff."""
+    S = len(cov)
+    E = len(emp_avail)
+    R = len(roles)
+    if not S or not R:
+        return {}
+    avail = np.asarray(emp_avail, dtype=np.int64).reshape(E, S)
+    can = np.asarray(emp_can_role, dtype=np.int64).reshape(E, R)
+    headcount = avail.T @ can  # [S, R] qualified staff available per slot and role
+    need = np.array([[int(cov[s].get(r, 0)) for r in roles] for s in range(S)], dtype=np.int64)
+    short = np.maximum(0, need - headcount)
+    return {roles[r]: g for r, g in slack_groups(short, slot_min, slot_size).items()}
+
+def presolve_summary(bound: dict, shortfalls: dict, slot_size: int, t0: float) -> dict:
+    """JSON section for a solve result; quantities converted from slots to hours."""
+    per_hour = 60.0 / slot_size
+
+    def hours(n):
+        h = n / per_hour
+        return int(h) if h == int(h) else round(h, 2)
+
+    return {
+        "demand_hours": hours(bound["demand"]),
+        "max_coverable_hours": hours(bound["max_coverable"]),
+        "lower_bound_unmet": hours(bound["lower_bound_unmet"]),
+        "shortfalls": shortfalls,
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000.0, 2),
+    }
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+# Publish solve results to the shifts table: POST /api/solve/publish.
+#
+# Takes a result of /api/solve, /api/solve/week or /api/solve/horizon (or a solve_batch_shops
+# row), diffs each day against the shop's shifts rows for that date (diff_assignment in
+# routes/solve.py: rows still covered for the same staff and role are kept, the rest are
+# deleted, new time is inserted as maximal intervals) and applies the diff in one transaction:
+# one DELETE ... WHERE id = ANY(...) and one COPY for the inserts, whatever the number of shifts.
+# A deleted shift that runs past the day that removed it (overnight) is split: its time outside
+# that day is inserted back with the same staff, role and status. A per-shop advisory lock serializes
+# concurrent publishes of the same shop.
+
+import time
+from datetime import date, timedelta
+from typing import Dict, Optional
+
+from db import SHIFT_MAX_SPAN
+from routes.solve import (
+    _conn,
+    _day_window_utc,
+    _load_env,
+    assignment_entries,
+    diff_assignment,
+    parse_time_token,
+    read_day_shifts,
+)
+
+try:
+    from flask import Blueprint, request, jsonify
+except Exception:
+    Blueprint = None
+    request = None
+    jsonify = None
+
+try:
+    import psycopg
+    from psycopg.rows import dict_row
+except Exception:
+    psycopg = None
+    dict_row = None
+
+class PublishError(ValueError):
+    """The result cannot be mapped onto the shop's staff, roles or dates."""
+
+def result_dates(result: dict, date_iso: Optional[str] = None) -> Dict[str, str]:
+    """{day label: date} for the days of a solve result.
+
+    Labels that are dates (horizon results) map to themselves, weekday labels use the result's
+    "dates" (week results with week_start); a single-day result may take date_iso instead.
+    """
+    labels = list(((result or {}).get("schedule") or {}).get("by_role_assignments") or {})
+    dates = dict((result or {}).get("dates") or {})
+    out = {}
+    for label in labels:
+        if label in dates:
+            out[label] = dates[label]
+            continue
+        try:
+            out[label] = date.fromisoformat(label).isoformat()
+            continue
+        except ValueError:
+            pass
+        if date_iso and len(labels) == 1:
+            out[label] = date_iso
+        else:
+            raise PublishError(f"no date for day {label!r}: pass date (single day) or week_start when solving")
+    return out
+
+def _outside(start, end, windows):
+    """The parts of [start, end) outside every (day_start, day_end) window."""
+    parts = [(start, end)]
+    for lo, hi in windows:
+        parts = [p for a, b in parts for p in ((a, min(b, lo)), (max(a, hi), b)) if p[0] < p[1]]
+    return parts
+
+def _shop_staff_and_roles(cur, shop_id: int):
+    cur.execute("SELECT id, name FROM staff WHERE shop_id = %s ORDER BY id", (shop_id,))
+    staff = cur.fetchall() or []
+    cur.execute("SELECT id, role_name FROM roles WHERE shop_id = %s ORDER BY id", (shop_id,))
+    roles = {r["role_name"].strip().lower(): r for r in cur.fetchall() or [] if r["role_name"]}
+    return staff, roles
+
+def publish_result(shop_id: int, result: dict, date_iso: Optional[str] = None, dry_run: bool = False,
+                   status: str = "scheduled") -> dict:
+    """Diff every day of a solve result against the shifts table and apply it in one transaction.
+    Returns {"dates": {date: {"add", "remove", "unchanged"}}, "added", "removed", "split",
+    "elapsed_ms"}, split counting removed rows whose time outside the removing days was kept;
+    dry_run computes the diff and rolls back. Raises PublishError for unknown staff, roles or dates.
+    """
+    t0 = time.perf_counter()
+    dates = result_dates(result, date_iso)
+    _load_env()
+    with _conn() as conn, conn.cursor(row_factory=dict_row) as cur:
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext('solve_publish'), %s)", (int(shop_id),))
+        staff, roles = _shop_staff_and_roles(cur, shop_id)
+        employees = [{"id": s["id"], "name": s["name"]} for s in staff]
+
+        per_day, add_rows, windows = {}, [], []
+        removed: Dict[int, dict] = {}
+        removed_on: Dict[int, list] = {}
+        for label, d in dates.items():
+            try:
+                entries = assignment_entries(result, label, employees)
+            except ValueError as ex:
+                raise PublishError(f"{d}: {ex} (shop {shop_id})") from ex
+            unknown = sorted({e["role"] for e in entries if e["role"].strip().lower() not in roles})
+            if unknown:
+                raise PublishError(f"{d}: roles not defined for shop {shop_id}: {unknown}")
+            # Compare by the roles table's spelling, which is what the current rows carry
+            entries = [dict(e, role=roles[e["role"].strip().lower()]["role_name"]) for e in entries]
+            current = read_day_shifts(cur, shop_id, d, lock=True, full=True)
+            diff = diff_assignment(entries, current)
+            per_day[d] = diff
+            rows_by_id = {r["shift_id"]: r for r in current}
+            day_start, day_end = _day_window_utc(d)
+            windows.append((day_start, day_end))
+            for r in diff["remove"]:
+                removed[r["shift_id"]] = rows_by_id[r["shift_id"]]
+                removed_on.setdefault(r["shift_id"], []).append((day_start, day_end))
+            for a in diff["add"]:
+                add_rows.append((
+                    a["staff_id"],
+                    roles[a["role"].strip().lower()]["id"],
+                    day_start + timedelta(minutes=parse_time_token(a["start"])),
+                    day_start + timedelta(minutes=parse_time_token(a["end"])),
+                    status,
+                ))
+
+        # Time of a removed row outside the days that removed it stays (overnight shifts)
+        remove_ids, split = sorted(removed), 0
+        for sid, row in removed.items():
+            parts = _outside(row["shift_start"], row["shift_end"], removed_on[sid])
+            split += bool(parts)
+            add_rows.extend((row["staff_id"], row["role_id"], a, b, row["status"]) for a, b in parts)
+
+        if remove_ids:
+            # The shift_start bounds let the delete touch only the month partitions of these days
+            cur.execute(
+                "DELETE FROM shifts WHERE id = ANY(%s) AND shift_start > %s AND shift_start < %s",
+                (remove_ids, min(w[0] for w in windows) - SHIFT_MAX_SPAN, max(w[1] for w in windows)),
+            )
+        if add_rows:
+            with cur.copy("COPY shifts (staff_id, role_id, shift_start, shift_end, status) FROM STDIN") as copy:
+                for row in add_rows:
+                    copy.write_row(row)
+        if dry_run:
+            conn.rollback()
+
+    return {
+        "dates": per_day,
+        "added": len(add_rows),
+        "split": split,
+        "removed": len(remove_ids),
+        "unchanged": sum(d["unchanged"] for d in per_day.values()),
+        "dry_run": bool(dry_run),
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000.0, 2),
+    }
+
+def fetch_batch_result(run_id: int, shop_id: int) -> Optional[dict]:
+    """The stored result of one shop in a nightly batch run (see routes/solve_batch.py)."""
+    _load_env()
+    with _conn() as conn, conn.cursor(row_factory=dict_row) as cur:
+        cur.execute("SELECT result FROM solve_batch_shops WHERE run_id = %s AND shop_id = %s", (run_id, shop_id))
+        row = cur.fetchone()
+    return row["result"] if row else None
+
+# ---------- Flask routes ----------
+
+if Blueprint is not None:
+    solve_publish_bp = Blueprint("solve_publish_bp", __name__, url_prefix="/api")
+
+    @solve_publish_bp.post("/solve/publish")
+    def publish_endpoint():
+        """
+        POST /api/solve/publish
+        {
+          "shop_id": 1,
+          "result": {...},          # body returned by /api/solve, /api/solve/week or /api/solve/horizon
+          "batch_run_id": 7,        # or: publish this shop's result from a nightly batch run
+          "date": "2025-09-22",     # single-day results only (week results need week_start when solving)
+          "dry_run": false          # true: return the diff without writing
+        }
+        Each day of the result replaces that day's shifts of the shop: rows still covered are kept,
+        the others deleted and new time inserted, all in one transaction. Returns the per-date diff,
+        or 409 shift_overlap when a new shift overlaps another shift of the same staff member.
+        """
+        if not request.is_json:
+            return jsonify({"error": "Content-Type must be application/json"}), 415
+
+        body = request.get_json(silent=True) or {}
+        shop_id = body.get("shop_id")
+        result = body.get("result")
+        run_id = body.get("batch_run_id")
+        date_iso = body.get("date")
+        dry_run = body.get("dry_run", False)
+
+        errors = []
+        if not isinstance(shop_id, int):
+            errors.append("shop_id must be int")
+        if (result is None) == (run_id is None):
+            errors.append("pass exactly one of result (object) or batch_run_id (int)")
+        elif result is not None and not isinstance(result, dict):
+            errors.append("result must be an object")
+        elif run_id is not None and not isinstance(run_id, int):
+            errors.append("batch_run_id must be int")
+        if date_iso is not None:
+            try:
+                date_iso = date.fromisoformat(str(date_iso)).isoformat()
+            except ValueError:
+                errors.append("date must be YYYY-MM-DD")
+        if not isinstance(dry_run, bool):
+            errors.append("dry_run must be boolean")
+        if errors:
+            return jsonify({"error": "validation_failed", "details": errors}), 400
+
+        try:
+            if run_id is not None:
+                result = fetch_batch_result(run_id, shop_id)
+                if result is None:
+                    return jsonify({"error": "batch_result_not_found"}), 404
+            if result.get("status") not in ("OPTIMAL", "FEASIBLE"):
+                return jsonify({"error": "validation_failed",
+                                "details": [f"result status {result.get('status')!r} has no schedule"]}), 400
+            published = publish_result(shop_id, result, date_iso, dry_run=dry_run)
+        except PublishError as ex:
+            return jsonify({"error": "validation_failed", "details": [str(ex)]}), 400
+        except psycopg.errors.ExclusionViolation as ex:
+            # A published shift overlaps another shift of the same staff member (e.g. another shop's)
+            return jsonify({"error": "shift_overlap", "details": str(ex)}), 409
+        except Exception as ex:
+            return jsonify({"error": "db_error", "detail": str(ex)}), 500
+        return jsonify(dict(published, shop_id=shop_id)), 200
+else:
+    solve_publish_bp = None
@@ -0,0 +1,387 @@
+from __future__ import annotations
+
+# Full-week solves for the HTTP API: POST /api/solve/week.
+#
+# One query loads the shop (hours, open days) together with all of its staff and their
+# availability for every weekday. The week is then solved either
+#   - "week":    in one solve_schedule model (weekly caps, break rule and fairness exact), or
+#   - "per_day": when that model would be too large, as one solve_single_day per open day,
+#                in parallel through the shared solver pool. Each employee's weekly cap is split
+#                across the days in proportion to their available hours, and every day enforces
+#                the week's 7-hour break rule, so the combined plan is valid for the week. A day
+#                with no solution inside its budget falls back to the greedy planner (solve_fast).
+# Both return the solve_schedule result shape (schedule, attendance, unmet_demand,
+# fairness_summary) plus "strategy"; per_day adds per-day status and timings under "per_day".
+#
+# Env:
+#   SOLVE_WEEK_MAX_VARS  largest week model (assignment variables, estimated) solved in one piece (default 20000)
+
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from routes.solve import (
+    ISO_WEEKDAYS,
+    SQL_QUALIFIED_ROLES,
+    _conn,
+    _load_env,
+    _normalize_availability_for_day,
+    _parse_solver_options,
+    _solve_opts,
+    _weekday_to_iso,
+    availability_slots_for_day,
+    parse_time_token,
+    qualified_roles,
+    solve_schedule,
+)
+
+try:
+    from flask import Blueprint, request, jsonify
+except Exception:
+    Blueprint = None
+    request = None
+    jsonify = None
+
+WEEK_MAX_VARS = int(os.getenv("SOLVE_WEEK_MAX_VARS", "20000") or 0)
+WEEK_STRATEGIES = ("auto", "week", "per_day")
+
+def _parse_week_request(body: dict, args: Optional[dict] = None) -> Tuple[Optional[dict], List[str]]:
+    """Validate a /api/solve/week body and return (week_request, errors)."""
+    args = args or {}
+    options, errors = _parse_solver_options(body, args, 30)
+    shop_id = body.get("shop_id")
+    roles = body.get("roles")
+    peaks = body.get("peaks") or []
+    days = body.get("days")
+    strategy = args.get("strategy") or body.get("strategy") or "auto"
+    week_start = body.get("week_start")
+
+    if not isinstance(shop_id, int):
+        errors.append("shop_id must be int")
+    if not isinstance(roles, dict) or not roles:
+        errors.append("roles must be a non-empty object {role:int}")
+    if not isinstance(peaks, list):
+        errors.append("peaks must be a list")
+    for key in ("open", "close"):
+        if body.get(key) is not None and not isinstance(body[key], str):
+            errors.append(f"{key} must be HH:MM string")
+    if strategy not in WEEK_STRATEGIES:
+        errors.append(f"strategy must be one of {list(WEEK_STRATEGIES)}")
+    # days: ["monday", ...] or {"monday": {open, close, roles, peaks}, ...} overriding the defaults
+    day_overrides = None
+    if days is not None:
+        if isinstance(days, list):
+            days = {d: {} for d in days}
+        if not isinstance(days, dict) or not days:
+            errors.append("days must be a list of weekdays or an object {weekday: {open, close, roles, peaks}}")
+        else:
+            day_overrides = {}
+            for d, over in days.items():
+                iso = _weekday_to_iso(str(d))
+                if iso not in ISO_WEEKDAYS or not isinstance(over or {}, dict):
+                    errors.append(f"days: unknown weekday or bad override for {d!r}")
+                    continue
+                day_overrides[iso] = dict(over or {})
+    if week_start is not None:
+        try:
+            week_start = date.fromisoformat(str(week_start)).isoformat()
+        except ValueError:
+            errors.append("week_start must be YYYY-MM-DD")
+    if errors:
+        return None, errors
+
+    return dict(
+        options,
+        shop_id=int(shop_id),
+        roles=roles,
+        peaks=peaks,
+        open=body.get("open"),
+        close=body.get("close"),
+        days=day_overrides,
+        strategy=strategy,
+        week_start=week_start,
+    ), []
+
+def _fetch_week_inputs(shop_id: int) -> Tuple[Optional[dict], List[dict]]:
+    """(shop row, staff rows) for one shop from a single query; (None, []) if the shop does not exist."""
+    from db import fetch_all
+
+    _load_env()
+    sql = f"""
+        SELECT sh.open_time, sh.close_time, sh.open_days,
+               st.id, st.name, st.availability, st.max_hours_per_week, {SQL_QUALIFIED_ROLES}
+        FROM shops sh
+        LEFT JOIN staff st ON st.shop_id = sh.id
+        WHERE sh.id = %s
+        ORDER BY st.name;
+    """
+    with _conn() as conn:
+        rows = fetch_all(sql, (int(shop_id),), prepare=True, conn=conn)
+    if not rows:
+        return None, []
+    shop = {k: rows[0][k] for k in ("open_time", "close_time", "open_days")}
+    return shop, [r for r in rows if r.get("id") is not None]
+
+def _hhmm_or_none(t) -> Optional[str]:
+    return t.strftime("%H:%M") if t is not None else None
+
+def _open_weekdays(open_days) -> List[str]:
+    """ISO weekdays marked open in shops.open_days ({"Mon": true, ...}); every day if unset."""
+    if not isinstance(open_days, dict) or not open_days:
+        return list(ISO_WEEKDAYS)
+    flagged = {_weekday_to_iso(str(k)) for k, v in open_days.items() if v}
+    return [d for d in ISO_WEEKDAYS if d in flagged]
+
+def build_week_payload(req: dict, shop: dict, staff_rows: List[dict]) -> dict:
+    """solve_schedule payload for a parsed week request and the rows from _fetch_week_inputs.
+    Staff get only the requested roles they are qualified for (staff_roles); staff with none are left out.
+    """
+    days = req.get("days")
+    weekdays = [d for d in ISO_WEEKDAYS if d in days] if days else _open_weekdays(shop.get("open_days"))
+    week = {}
+    for d in weekdays:
+        over = (days or {}).get(d) or {}
+        cfg = {
+            "open": over.get("open") or req.get("open") or _hhmm_or_none(shop.get("open_time")),
+            "close": over.get("close") or req.get("close") or _hhmm_or_none(shop.get("close_time")),
+            "roles": over.get("roles") or req["roles"],
+        }
+        if not cfg["open"] or not cfg["close"]:
+            raise ValueError(f"{d}: no open/close time in the request or the shops table")
+        peaks = over.get("peaks", req.get("peaks"))
+        if peaks:
+            cfg["peaks"] = peaks
+        week[d] = cfg
+
+    role_names = sorted({r for cfg in week.values() for r in cfg["roles"]}
+                        | {r for cfg in week.values() for p in cfg.get("peaks", []) for r in p.get("extra", {})})
+    employees = []
+    for r in staff_rows:
+        roles = qualified_roles(role_names, r.get("qualified_roles"))
+        if not roles:
+            continue
+        employees.append({
+            "id": int(r["id"]),
+            "name": r.get("name") or f"staff-{r['id']}",
+            "roles": roles,
+            "max_weekly_hours": int(r.get("max_hours_per_week") or 40),
+            "availability": {d: _normalize_availability_for_day(r.get("availability"), d) for d in week},
+        })
+    return {"week": week, "employees": employees}
+
+def _available_slots(payload: dict, slot_size: int) -> Dict[str, List[int]]:
+    """{day: [available slots per employee]} within each day's opening hours."""
+    out = {}
+    for d, cfg in payload["week"].items():
+        open_m, close_m = parse_time_token(cfg["open"]), parse_time_token(cfg["close"])
+        out[d] = [sum(availability_slots_for_day((emp.get("availability") or {}).get(d) or [], open_m, close_m, slot_size))
+                  for emp in payload["employees"]]
+    return out
+
+def week_model_size(payload: dict, slot_size: int = 60) -> int:
+    """Upper estimate of solve_schedule's assignment variables (available slots x qualified roles)."""
+    n_roles = [len(emp.get("roles") or []) for emp in payload["employees"]]
+    return sum(n * per_day[e] for per_day in _available_slots(payload, slot_size).values() for e, n in enumerate(n_roles))
+
+def split_weekly_caps(payload: dict, slot_size: int = 60) -> Dict[str, List[int]]:
+    """Whole-hour cap per day and employee, splitting max_weekly_hours in proportion to available
+    slots (largest remainder, so the daily caps add up to the weekly cap or the available hours).
+    """
+    avail = _available_slots(payload, slot_size)
+    days = list(payload["week"])
+    caps = {d: [0] * len(payload["employees"]) for d in days}
+    for e, emp in enumerate(payload["employees"]):
+        slots = [avail[d][e] for d in days]
+        total = sum(slots)
+        if not total:
+            continue
+        weekly = min(int(emp.get("max_weekly_hours", 40)), math.floor(total * slot_size / 60))
+        shares = [weekly * n / total for n in slots]
+        whole = [math.floor(x) for x in shares]
+        rest = sorted(range(len(days)), key=lambda i: shares[i] - whole[i], reverse=True)
+        for i in rest[:weekly - sum(whole)]:
+            whole[i] += 1
+        for i, d in enumerate(days):
+            caps[d][e] = whole[i]
+    return caps
+
+def _merge_day_results(results: Dict[str, dict], employees: List[dict]) -> dict:
+    """Combine per-day solve_single_day results into the solve_schedule result shape."""
+    names = [emp["name"] for emp in employees]
+    statuses = [r.get("status") for r in results.values()]
+    if any(s not in ("OPTIMAL", "FEASIBLE") for s in statuses):
+        status = "INFEASIBLE"
+    elif all(s == "OPTIMAL" for s in statuses):
+        status = "OPTIMAL"
+    else:
+        status = "FEASIBLE"
+
+    days, by_role, unmet = {}, {}, {}
+    attendance = {name: {} for name in names}
+    hours = {name: 0 for name in names}
+    total_unmet = 0
+    for d, r in results.items():
+        if r.get("status") not in ("OPTIMAL", "FEASIBLE"):
+            continue
+        days[d] = r["schedule"]["days"][d]
+        by_role[d] = r["schedule"]["by_role_assignments"][d]
+        unmet.update(r.get("unmet_demand") or {})
+        for name, ivs in r["by_day"][d]["employees"].items():
+            if ivs:
+                attendance[name][d] = ivs
+        for name, h in r["fairness_summary"]["emp_hours_today"].items():
+            hours[name] += h
+        total_unmet += r["fairness_summary"]["total_unmet"]
+    return {
+        "status": status,
+        "schedule": {"days": days, "by_role_assignments": by_role},
+        "attendance": attendance,
+        "unmet_demand": unmet,
+        "fairness_summary": {
+            "min_hours": min(hours.values(), default=0),
+            "max_hours": max(hours.values(), default=0),
+            "emp_hours": hours,
+            "employees_used": sum(1 for h in hours.values() if h > 0),
+            "total_unmet": total_unmet,
+        },
+    }
+
+def solve_day_piece(day_payload: dict, day_label: str, time_limit_s: int, slot_size: int = 60,
+                    **opts) -> Tuple[dict, float]:
+    """One day of a decomposed multi-day plan: solve_single_day in the pool with the break rule on,
+    or the greedy planner (same caps and break rule) when no solution is found in time.
+    Returns (result with "engine", seconds).
+    """
+    from routes.solve_fast import solve_single_day_fast
+    from routes.solve_pool import solve_in_pool
+
+    t0 = time.perf_counter()
+    result = dict(solve_in_pool("single_day", day_payload, day_label=day_label, time_limit_s=time_limit_s,
+                                slot_size=slot_size, break_rule=True, **opts), engine="exact")
+    if result.get("status") not in ("OPTIMAL", "FEASIBLE"):
+        result = dict(solve_single_day_fast(day_payload, day_label=day_label, slot_size=slot_size,
+                                            backups=opts.get("backups", True)), engine="fast")
+    return result, round(time.perf_counter() - t0, 3)
+
+def pool_waves(n_tasks: int) -> int:
+    """How many rounds n_tasks parallel solves take in the pool (to split a time budget)."""
+    from routes.solve_pool import POOL_SIZE
+    return math.ceil(n_tasks / max(1, min(n_tasks, POOL_SIZE))) if n_tasks else 1
+
+def solve_week_per_day(payload: dict, time_limit_s: int = 30, slot_size: int = 60, **opts) -> dict:
+    """Solve each day of a week payload as its own model, in parallel through the solver pool."""
+    from routes.solve_pool import POOL_SIZE
+
+    days = list(payload["week"])
+    caps = split_weekly_caps(payload, slot_size)
+    # Days beyond the pool size queue up; split the budget so the week still ends in time_limit_s
+    day_limit = max(1, int(time_limit_s) // pool_waves(len(days)))
+
+    def solve_day(d):
+        day_payload = {
+            "day": payload["week"][d],
+            "employees": [dict(emp, max_weekly_hours=caps[d][e], prev_hours=0)
+                          for e, emp in enumerate(payload["employees"])],
+        }
+        return solve_day_piece(day_payload, d, day_limit, slot_size, **opts)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(len(days), POOL_SIZE))) as ex:
+        done = dict(zip(days, ex.map(solve_day, days)))
+    out = _merge_day_results({d: r for d, (r, _t) in done.items()}, payload["employees"])
+    out["per_day"] = {
+        d: {"status": r.get("status"), "engine": r.get("engine"), "time_s": t, "time_limit_s": day_limit,
+            "max_hours": dict(zip((emp["name"] for emp in payload["employees"]), caps[d])),
+            "model_stats": r.get("model_stats")}
+        for d, (r, t) in done.items()
+    }
+    return out
+
+def solve_week_payload(payload: dict, req: dict) -> dict:
+    """Solve a week payload with the requested strategy ("auto" picks by estimated model size)."""
+    from routes.solve_pool import solve_in_pool
+
+    opts = _solve_opts(req)
+    if req.get("presolve_only"):
+        return dict(solve_schedule(payload, slot_size=int(req.get("slot_size") or 60), presolve_only=True),
+                    strategy="presolve")
+    strategy = req.get("strategy", "auto")
+    size = week_model_size(payload, int(req.get("slot_size") or 60))
+    if strategy == "auto":
+        strategy = "per_day" if WEEK_MAX_VARS and size > WEEK_MAX_VARS else "week"
+
+    t0 = time.perf_counter()
+    if strategy == "week":
+        result = solve_in_pool("week", payload, **opts)
+    else:
+        # Fairness is balanced within each day only
+        result = solve_week_per_day(payload, **opts)
+    return dict(result, strategy=strategy, estimated_vars=size, time_s=round(time.perf_counter() - t0, 3))
+
+def _week_dates(week_start: Optional[str], days: List[str]) -> Optional[Dict[str, str]]:
+    if not week_start:
+        return None
+    start = date.fromisoformat(week_start)
+    monday = start - timedelta(days=start.weekday())
+    return {d: (monday + timedelta(days=ISO_WEEKDAYS.index(d))).isoformat() for d in days}
+
+# ---------- Flask routes ----------
+
+if Blueprint is not None:
+    solve_week_bp = Blueprint("solve_week_bp", __name__, url_prefix="/api")
+
+    @solve_week_bp.post("/solve/week")
+    def solve_week_endpoint():
+        """
+        POST /api/solve/week
+        {
+          "shop_id": 1,
+          "roles": {"cashier": 1, "helper": 2},              # demand on every open day
+          "peaks": [{"start":"10:00","end":"12:00","extra":{"cashier":1}}],  # optional, every day
+          "open": "09:00", "close": "22:00",                # optional; default shops.open_time/close_time
+          "days": {"saturday": {"open":"10:00","roles":{"cashier":2}}},     # optional; or ["monday", ...]
+          "week_start": "2025-09-22"                        # optional; adds "dates" to the result
+        }
+        Days default to shops.open_days. Staff, availability, weekly caps and role qualifications
+        (staff_roles) come from one query.
+
+        Optional query/body:
+          - strategy: "auto" (default), "week" (one model) or "per_day" (parallel day models with the
+              weekly caps split by availability); auto uses per_day above SOLVE_WEEK_MAX_VARS
+          - time_limit (default 30), objective, fairness_time_limit, relative_gap, slot_size,
+              formulation, shift_rules, backups, stop_at_bound, presolve_only: as for /api/solve
+        """
+        if not request.is_json:
+            return jsonify({"error": "Content-Type must be application/json"}), 415
+
+        body = request.get_json(silent=True) or {}
+        req, errors = _parse_week_request(body, request.args)
+        if errors:
+            return jsonify({"error": "validation_failed", "details": errors}), 400
+
+        try:
+            shop, staff_rows = _fetch_week_inputs(req["shop_id"])
+        except Exception as ex:
+            return jsonify({"error": "db_error", "detail": str(ex)}), 500
+        if shop is None:
+            return jsonify({"error": "shop_not_found"}), 404
+        try:
+            payload = build_week_payload(req, shop, staff_rows)
+        except ValueError as ex:
+            return jsonify({"error": "validation_failed", "details": [str(ex)]}), 400
+        if not payload["week"]:
+            return jsonify({"error": "validation_failed", "details": ["shop has no open days"]}), 400
+
+        try:
+            result = solve_week_payload(payload, req)
+        except Exception as ex:
+            return jsonify({"error": "Failed to compute schedule", "detail": str(ex)}), 500
+
+        dates = _week_dates(req.get("week_start"), list(payload["week"]))
+        if dates:
+            result["dates"] = dates
+        return jsonify(result), 200
+else:
+    solve_week_bp = None
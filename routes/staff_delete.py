@@ -1,19 +1,14 @@
 from __future__ import annotations
 
-import os
 from flask import Blueprint, request, jsonify
-import psycopg2
-from dotenv import load_dotenv
-
-load_dotenv()
-DBURL = os.getenv("DBURL")
+import psycopg
+from db import connection
 
 staff_delete_bp = Blueprint("staff_delete_bp", __name__, url_prefix="/api")
 
 def _get_conn():
-    if not DBURL:
-        raise RuntimeError("DBURL not set in .env")
-    return psycopg2.connect(DBURL)
+    # Pooled connection (db.py); commits when the with-block exits cleanly
+    return connection()
 
 @staff_delete_bp.delete("/staff/delete")
 def staff_delete():
@@ -28,7 +23,7 @@ def staff_delete():
             cur.execute(sql, (staff_id, shop_id))
             deleted = cur.rowcount
             conn.commit()
-    except psycopg2.errors.ForeignKeyViolation as e:
+    except psycopg.errors.ForeignKeyViolation as e:
         return jsonify({"error": "foreign_key_violation", "details": str(e)}), 409
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -0,0 +1,86 @@
+import copy
+
+import pytest
+
+from routes import solve_cache as cache_mod
+from routes.solve_cache import SolveCache, solve_cache_key
+
+PAYLOAD = {
+    "day": {
+        "open": "08:00",
+        "close": "18:00",
+        "roles": {"Cashier": 2, "Stocker": 1},
+        "peaks": [{"start": "12:00", "end": "14:00", "extra": {"Cashier": 1}},
+                  {"start": "16:00", "end": "17:00", "extra": {"Stocker": 1}}],
+    },
+    "employees": [
+        {"id": 1, "name": "Ann", "roles": ["Cashier", "Stocker"], "max_weekly_hours": 40, "prev_hours": 8,
+         "availability": [["08:00", "18:00"]]},
+        {"id": 2, "name": "Ben", "roles": ["Stocker"], "availability": ["09:00-13:00"]},
+    ],
+}
+OPTS = {"slot_size": 60, "backups": True, "objective": "balanced"}
+
+
+def key(payload=PAYLOAD, **opts):
+    return solve_cache_key(payload, "day", **dict(OPTS, **opts))
+
+
+def test_key_is_stable_under_reordering():
+    p = copy.deepcopy(PAYLOAD)
+    p["employees"].reverse()
+    p["employees"][0]["roles"].reverse()
+    p["employees"] = [dict(reversed(list(emp.items()))) for emp in p["employees"]]
+    p["day"]["peaks"].reverse()
+    p["day"]["roles"] = {"Stocker": 1, "Cashier": 2}
+    p["day"] = dict(reversed(list(p["day"].items())))
+    assert key(p) == key()
+    assert solve_cache_key(PAYLOAD, "day", **dict(reversed(list(OPTS.items())))) == key()
+
+
+def test_key_ignores_how_times_are_written():
+    p = copy.deepcopy(PAYLOAD)
+    p["employees"][1]["availability"] = [["09:00", "13:00"]]
+    assert key(p) == key()
+
+
+@pytest.mark.parametrize("opt,value", [("backups", False), ("slot_size", 30), ("objective", "min_staff")])
+def test_key_differs_by_solve_option(opt, value):
+    assert key(**{opt: value}) != key()
+
+
+def test_key_differs_by_problem():
+    p = copy.deepcopy(PAYLOAD)
+    p["employees"][0]["prev_hours"] = 9
+    assert key(p) != key()
+
+
+def test_lru_evicts_the_least_recently_used_entry():
+    c = SolveCache(max_size=2, ttl_s=60)
+    c.put("a", {"v": 1})
+    c.put("b", {"v": 2})
+    assert c.get("a") == {"v": 1}
+    c.put("c", {"v": 3})
+    assert c.get("b") is None
+    assert c.get("a") == {"v": 1} and c.get("c") == {"v": 3}
+    assert c.evictions == 1
+    assert c.stats()["size"] == 2
+
+
+def test_ttl_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_mod.time, "monotonic", lambda: now[0])
+    c = SolveCache(max_size=4, ttl_s=10)
+    c.put("a", {"v": 1})
+    now[0] += 9.9
+    assert c.get("a") == {"v": 1}
+    now[0] += 0.1
+    assert c.get("a") is None
+    assert (c.hits, c.misses, c.expirations) == (1, 1, 1)
+    assert c.stats()["size"] == 0
+
+
+def test_zero_size_disables_the_cache():
+    c = SolveCache(max_size=0)
+    c.put("a", {"v": 1})
+    assert c.get("a") is None
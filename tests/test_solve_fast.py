@@ -0,0 +1,88 @@
+import pytest
+
+from routes.solve import parse_time_token
+from routes.solve_fast import solve_single_day_fast
+
+DAY = {
+    "open": "08:00",
+    "close": "20:00",
+    "roles": {"Cashier": 1, "Stocker": 1},
+    "peaks": [{"start": "12:00", "end": "14:00", "extra": {"Cashier": 2}}],
+}
+EMPLOYEES = [
+    {"id": 1, "name": "Ann", "roles": ["Cashier"], "availability": [["08:00", "20:00"]]},
+    {"id": 2, "name": "Ben", "roles": ["Cashier", "Stocker"], "availability": [["08:00", "20:00"]]},
+    {"id": 3, "name": "Cy", "roles": ["Stocker"], "availability": [["10:00", "18:00"]]},
+    {"id": 4, "name": "Dee", "roles": ["Cashier"], "availability": ["08:00-20:00"],
+     "max_weekly_hours": 30, "prev_hours": 27},
+    {"id": 5, "name": "Eve", "availability": [["14:00", "20:00"]]},
+]
+
+
+def demand_at(minute):
+    d = dict(DAY["roles"])
+    for p in DAY["peaks"]:
+        if parse_time_token(p["start"]) <= minute < parse_time_token(p["end"]):
+            for r, x in p["extra"].items():
+                d[r] += x
+    return d
+
+
+def grid(res, slot_size):
+    """{(employee, slot start minute): role} from the by_role blocks; fails on double booking."""
+    out = {}
+    for role, blocks in res["schedule"]["by_role_assignments"]["day"].items():
+        for b in blocks:
+            for m in range(parse_time_token(b["start"]), parse_time_token(b["end"]), slot_size):
+                for name in b["employees"]:
+                    assert (name, m) not in out, f"{name} double booked at {m}"
+                    out[name, m] = role
+    return out
+
+
+@pytest.mark.parametrize("slot_size", [60, 30])
+def test_greedy_plan_respects_every_rule(slot_size):
+    res = solve_single_day_fast({"day": DAY, "employees": EMPLOYEES}, "day", slot_size)
+    assert res["status"] == "FEASIBLE"
+    plan = grid(res, slot_size)
+    by_name = {emp["name"]: emp for emp in EMPLOYEES}
+    open_m, close_m = parse_time_token(DAY["open"]), parse_time_token(DAY["close"])
+
+    # Coverage: nobody beyond demand, and every shortfall is reported in total_unmet and unmet_demand
+    short = 0
+    for m in range(open_m, close_m, slot_size):
+        for role, need in demand_at(m).items():
+            staffed = sum(1 for (_, t), r in plan.items() if t == m and r == role)
+            assert staffed <= need
+            short += need - staffed
+            if staffed < need:
+                assert any(parse_time_token(g["start"]) <= m < parse_time_token(g["end"]) and g["needed"] >= need - staffed
+                           for g in res["unmet_demand"]["day"][role])
+    assert short * slot_size / 60 == res["fairness_summary"]["total_unmet"]
+
+    for (name, m), role in plan.items():
+        emp = by_name[name]
+        # Availability and qualification
+        windows = [w.split("-") if isinstance(w, str) else w for w in emp["availability"]]
+        assert any(parse_time_token(a) <= m and m + slot_size <= parse_time_token(b) for a, b in windows)
+        assert not emp.get("roles") or role in emp["roles"]
+
+    window, limit = 7 * 60, 6 * 60
+    for name, emp in by_name.items():
+        worked = sorted(m for (n, m) in plan if n == name)
+        # Break rule: at most 6 h worked in any 7 h window
+        for start in range(open_m - window, close_m, slot_size):
+            assert sum(slot_size for m in worked if start <= m < start + window) <= limit
+        # Weekly cap
+        hours = len(worked) * slot_size / 60
+        assert hours == res["fairness_summary"]["emp_hours_today"][name]
+        assert hours + emp.get("prev_hours", 0) <= emp.get("max_weekly_hours", 40)
+
+
+def test_greedy_plan_reports_demand_nobody_can_cover():
+    employees = [{"id": 1, "name": "Ann", "roles": ["Cashier"], "availability": [["08:00", "20:00"]]}]
+    res = solve_single_day_fast({"day": DAY, "employees": employees}, "day", 60, backups=False)
+    assert "Stocker" in res["unmet_demand"]["day"]
+    # Ann works 6 of every 7 hours at most, so 12 open hours leave her at most 11 worked
+    assert res["fairness_summary"]["emp_hours_today"]["Ann"] <= 11
+    assert res["fairness_summary"]["total_unmet"] >= 12 + 2 * 2 + 12 - 11
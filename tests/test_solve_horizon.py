@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+from routes.solve_horizon import _adjust_budgets, _spread
+
+
+@pytest.mark.parametrize("total,room", [
+    (0, [3, 4]), (5, [0, 0, 0]), (7, [3, 4]), (10, [3, 4]), (5, [1, 1, 1, 1, 1, 1, 1]), (8, [8, 0, 3]), (-2, [4]),
+])
+def test_spread_places_exactly_what_fits(total, room):
+    out = _spread(total, room)
+    assert sum(out) == max(0, min(total, sum(room)))
+    assert all(0 <= x <= r for x, r in zip(out, room))
+
+
+def test_spread_fuzz():
+    rng = random.Random(7)
+    for _ in range(500):
+        room = [rng.randint(0, 12) for _ in range(rng.randint(1, 7))]
+        total = rng.randint(0, 60)
+        out = _spread(total, room)
+        assert sum(out) == min(total, sum(room))
+        assert all(0 <= x <= r for x, r in zip(out, room))
+
+
+def _fake_week(rng, week, n_days, names, roles):
+    """Budgets within week caps, plus day results that used some of it and left demand unmet."""
+    E = len(names)
+    wdays = [f"{week}-d{i}" for i in range(n_days)]
+    avail = {d: [rng.randint(0, 10) for _ in range(E)] for d in wdays}
+    caps = [rng.randint(0, 40) for _ in range(E)]
+    budget = {d: [0] * E for d in wdays}
+    for e in range(E):
+        extra = _spread(caps[e], [avail[d][e] for d in wdays])
+        for i, d in enumerate(wdays):
+            budget[d][e] = extra[i]
+    results = {}
+    for d in wdays:
+        used = {n: rng.randint(0, budget[d][e]) for e, n in enumerate(names)}
+        unmet = {r: rng.randint(0, 4) for r in roles if rng.random() < 0.6}
+        results[d] = {
+            "fairness_summary": {"emp_hours_today": used, "total_unmet": sum(unmet.values())},
+            "unmet_demand": {d: unmet},
+        }
+    return wdays, caps, budget, results, avail
+
+
+def test_adjust_budgets_never_exceeds_the_week_cap():
+    rng = random.Random(11)
+    names = [f"e{i}" for i in range(6)]
+    roles = ["Cashier", "Stocker"]
+    for _ in range(200):
+        can = [[rng.randint(0, 1) for _ in roles] for _ in names]
+        weeks, week_cap, budget, results, avail = {}, {}, {}, {}, {}
+        for w in ("w1", "w2"):
+            wdays, caps, b, res, av = _fake_week(rng, w, rng.randint(2, 7), names, roles)
+            weeks[w], week_cap[w] = wdays, caps
+            budget.update(b), results.update(res), avail.update(av)
+        before = {d: list(v) for d, v in budget.items()}
+
+        gained = _adjust_budgets(weeks, budget, results, None, avail, can, roles, names)
+
+        for w, wdays in weeks.items():
+            for e in range(len(names)):
+                assert sum(budget[d][e] for d in wdays) <= week_cap[w][e]
+                assert sum(budget[d][e] for d in wdays) == sum(before[d][e] for d in wdays)
+        assert all(x >= 0 for v in budget.values() for x in v)
+        assert all(h > 0 for h in gained.values())
+
+
+def test_adjust_budgets_moves_spare_hours_to_the_short_day():
+    names, roles = ["Ann"], ["Cashier"]
+    weeks = {"w": ["mon", "tue"]}
+    budget = {"mon": [8], "tue": [4]}
+    results = {
+        "mon": {"fairness_summary": {"emp_hours_today": {"Ann": 3}, "total_unmet": 0}},
+        "tue": {"fairness_summary": {"emp_hours_today": {"Ann": 4}, "total_unmet": 2},
+                "unmet_demand": {"tue": {"Cashier": 2}}},
+    }
+    gained = _adjust_budgets(weeks, budget, results, None, {"mon": [8], "tue": [8]}, [[1]], roles, names)
+    assert gained == {"tue": 2}
+    assert budget == {"mon": [6], "tue": [6]}
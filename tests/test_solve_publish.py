@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from routes.solve import assignment_entries, diff_assignment
+from routes.solve_publish import PublishError, _outside, result_dates
+
+UTC = timezone.utc
+EMPLOYEES = [{"id": 1, "name": "Ann"}, {"id": 2, "name": "Ben"}, {"id": 3, "name": "Cy"}]
+
+
+def at(day, hour):
+    return datetime(2025, 9, day, tzinfo=UTC) + timedelta(hours=hour)
+
+
+def day_window(day):
+    return at(day, 0), at(day + 1, 0)
+
+
+def result(by_day, **extra):
+    return dict({"status": "OPTIMAL", "schedule": {"by_role_assignments": by_day}}, **extra)
+
+
+# ---------- _outside ----------
+
+def test_outside_keeps_the_previous_night_of_an_overnight_shift():
+    assert _outside(at(22, 20), at(23, 4), [day_window(23)]) == [(at(22, 20), at(23, 0))]
+
+
+def test_outside_keeps_the_next_morning_of_an_overnight_shift():
+    assert _outside(at(22, 20), at(23, 4), [day_window(22)]) == [(at(23, 0), at(23, 4))]
+
+
+def test_outside_is_empty_when_every_touched_day_removes_the_shift():
+    assert _outside(at(22, 20), at(23, 4), [day_window(22), day_window(23)]) == []
+
+
+def test_outside_of_a_shift_inside_the_day_is_empty():
+    assert _outside(at(22, 9), at(22, 17), [day_window(22)]) == []
+
+
+def test_outside_ignores_windows_the_shift_does_not_touch():
+    assert _outside(at(22, 9), at(22, 17), [day_window(24)]) == [(at(22, 9), at(22, 17))]
+
+
+# ---------- result_dates ----------
+
+def test_result_dates_maps_weekdays_through_the_result_dates():
+    res = result({"monday": {}, "tuesday": {}}, dates={"monday": "2025-09-22", "tuesday": "2025-09-23"})
+    assert result_dates(res) == {"monday": "2025-09-22", "tuesday": "2025-09-23"}
+
+
+def test_result_dates_accepts_date_labels():
+    assert result_dates(result({"2025-09-22": {}})) == {"2025-09-22": "2025-09-22"}
+
+
+def test_result_dates_uses_date_iso_for_a_single_day():
+    assert result_dates(result({"day": {}}), "2025-09-24") == {"day": "2025-09-24"}
+
+
+def test_result_dates_rejects_a_week_without_dates():
+    with pytest.raises(PublishError):
+        result_dates(result({"monday": {}, "tuesday": {}}), "2025-09-22")
+
+
+# ---------- assignment_entries + diff_assignment ----------
+
+def test_entries_round_trip_against_identical_rows_is_a_no_op():
+    res = result({"day": {"Cashier": [{"start": "09:00", "end": "13:00", "employees": ["Ann", "Ben"]}]}})
+    entries = assignment_entries(res, "day", EMPLOYEES)
+    assert {(e["staff_id"], e["employee"]) for e in entries} == {(1, "Ann"), (2, "Ben")}
+    current = [dict(e, shift_id=10 + i) for i, e in enumerate(entries)]
+    assert diff_assignment(entries, current) == {"add": [], "remove": [], "unchanged": 2}
+
+
+def test_diff_keeps_covered_rows_removes_the_rest_and_adds_new_time():
+    res = result({"day": {"Cashier": [
+        {"start": "09:00", "end": "12:00", "employees": ["Ann"]},
+        {"start": "12:00", "end": "15:00", "employees": ["Ann", "Cy"]},
+    ]}})
+    current = [
+        {"shift_id": 1, "staff_id": 1, "employee": "Ann", "role": "Cashier", "start": "10:00", "end": "14:00"},
+        {"shift_id": 2, "staff_id": 2, "employee": "Ben", "role": "Cashier", "start": "09:00", "end": "17:00"},
+    ]
+    diff = diff_assignment(assignment_entries(res, "day", EMPLOYEES), current)
+    assert diff["unchanged"] == 1
+    assert [r["shift_id"] for r in diff["remove"]] == [2]
+    assert [(a["staff_id"], a["start"], a["end"]) for a in diff["add"]] == [
+        (1, "09:00", "10:00"), (1, "14:00", "15:00"), (3, "12:00", "15:00"),
+    ]
+
+
+def test_diff_removes_a_row_whose_role_changed():
+    res = result({"day": {"Stocker": [{"start": "09:00", "end": "17:00", "employees": ["Ann"]}]}})
+    current = [{"shift_id": 1, "staff_id": 1, "employee": "Ann", "role": "Cashier", "start": "09:00", "end": "17:00"}]
+    diff = diff_assignment(assignment_entries(res, "day", EMPLOYEES), current)
+    assert [r["shift_id"] for r in diff["remove"]] == [1]
+    assert diff["add"] == [{"staff_id": 1, "employee": "Ann", "role": "Stocker", "start": "09:00", "end": "17:00"}]
+
+
+def test_entries_prefer_staff_ids_over_names():
+    res = result({"day": {"Cashier": [{"start": "09:00", "end": "10:00", "employees": [{"id": 2, "name": "Ann"}, 3]}]}})
+    assert [(e["staff_id"], e["employee"]) for e in assignment_entries(res, "day", EMPLOYEES)] == [(2, "Ben"), (3, "Cy")]
+
+
+@pytest.mark.parametrize("who", ["Nobody", 99, {"staff_id": 99}])
+def test_entries_reject_unknown_staff(who):
+    res = result({"day": {"Cashier": [{"start": "09:00", "end": "10:00", "employees": [who]}]}})
+    with pytest.raises(ValueError):
+        assignment_entries(res, "day", EMPLOYEES)
+
+
+def test_entries_reject_names_shared_by_several_staff():
+    res = result({"day": {"Cashier": [{"start": "09:00", "end": "10:00", "employees": ["Ann"]}]}})
+    with pytest.raises(ValueError):
+        assignment_entries(res, "day", EMPLOYEES + [{"id": 4, "name": "Ann"}])
@@ -0,0 +1,37 @@
+from routes.solve import diff_assignment, prior_slot_set
+
+
+def test_prior_slot_set_matches_roles_case_insensitively():
+    # Shifts rows carry roles.role_name as stored ("Cashier"), requests use "cashier"
+    prior = [
+        {"staff_id": 10, "employee": "e0", "role": "Cashier", "start": "09:00", "end": "11:00"},
+        {"employee": "e1", "role": " STOCKER ", "start": "10:00", "end": "11:00"},
+    ]
+    got = prior_slot_set(prior, ["e0", "e1"], [10, 11], ["cashier", "stocker"], day_open_m=9 * 60, S=8)
+    assert got == {(0, 0, 0), (0, 1, 0), (1, 1, 1)}
+
+
+def test_diff_assignment_keeps_rows_with_differently_cased_roles():
+    new = [
+        {"staff_id": 1, "employee": "e0", "role": "cashier", "start": "09:00", "end": "13:00"},
+        {"staff_id": 2, "employee": "e1", "role": "cashier", "start": "13:00", "end": "17:00"},
+    ]
+    current = [
+        {"shift_id": 5, "staff_id": 1, "employee": "e0", "role": "Cashier", "start": "09:00", "end": "13:00"},
+        {"shift_id": 6, "staff_id": 2, "employee": "e1", "role": "Cashier", "start": "13:00", "end": "15:00"},
+    ]
+    diff = diff_assignment(new, current)
+    assert diff["unchanged"] == 2
+    assert diff["remove"] == []
+    assert diff["add"] == [{"staff_id": 2, "employee": "e1", "role": "cashier", "start": "15:00", "end": "17:00"}]
+
+
+def test_prior_slot_set_reports_matched_entries():
+    prior = [
+        {"employee": "e0", "role": "Cashier", "start": "09:00", "end": "10:00"},
+        {"employee": "ghost", "role": "cashier", "start": "09:00", "end": "10:00"},
+        {"employee": "e0", "role": "baker", "start": "09:00", "end": "10:00"},
+    ]
+    stats = {}
+    prior_slot_set(prior, ["e0"], [None], ["cashier"], day_open_m=9 * 60, S=8, stats=stats)
+    assert stats == {"prior_entries": 3, "prior_matched": 1}